@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+NRD 2.0 Ultimate Data Feed parser
+WHOISXMLAPI.COM - Professional Services.  Provided "as-is".
+Python replacement for nrd2-parse-ultimate.sh. Counts the records of an NRD 2.0
+Ultimate daily file by reason, optionally listing them, and can be imported to
+iterate over the records of the file.
+
+The raw text fields of the ultimate files are quoted and may contain commas
+and newlines, so records are read with the csv module instead of being split
+on lines and commas.
+  example: $ nrd2_parse_ultimate.py nrd.2021-11-25.ultimate.daily.data.csv
+           $ nrd2_parse_ultimate.py --workers 8 nrd.2021-11-25.ultimate.daily.data.csv
+
+  from nrd2_parse_ultimate import iter_records
+  for rec in iter_records("nrd.2021-11-25.ultimate.daily.data.csv"):
+      print(rec.reason, rec.domainName, rec.registrarName)
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+# ── Format ────────────────────────────────────────────────────────────────────
+
+NRD2_FIELDS = (
+    "reason domainName registrarName registrarIANAID whoisServer nameServers "
+    "createdDateRaw updatedDateRaw expiresDateRaw createdDateParsed updatedDateParsed "
+    "expiresDateParsed status registryDataRawText whoisRecordRawText auditUpdatedDate "
+    "contactEmail"
+).split() + [
+    f"{contact}_{field}"
+    for contact in ("registrant", "administrativeContact", "billingContact",
+                    "technicalContact", "zoneContact")
+    for field in ("rawText", "email", "name", "organization", "street1", "street2",
+                  "street3", "street4", "city", "state", "postalCode", "country",
+                  "fax", "faxExt", "telephone", "telephoneExt")
+]
+
+NRD2Record = namedtuple("NRD2Record", NRD2_FIELDS)
+
+REASONS = ("added", "dropped", "updated", "discovered")
+
+# Raw text fields can be much larger than the csv module's default limit.
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+# ── Reading ───────────────────────────────────────────────────────────────────
+
+def _to_record(row: List[str]) -> NRD2Record:
+    n = len(NRD2_FIELDS)
+    if len(row) != n:
+        row = (row + [""] * n)[:n]
+    return NRD2Record._make(row)
+
+
+class _RangeReader(io.RawIOBase):
+    """Raw stream over the byte range [start, end) of an open binary file."""
+
+    def __init__(self, fh, start: int, end: int):
+        fh.seek(start)
+        self._fh = fh
+        self._left = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._left <= 0:
+            return 0
+        n = self._fh.readinto(memoryview(b)[:self._left]) or 0
+        self._left -= n
+        return n
+
+
+def iter_records(path: str, start: Optional[int] = None,
+                 end: Optional[int] = None) -> Iterator[Tuple[int, NRD2Record]]:
+    """Yield (line number, record) for the records of an ultimate file.
+
+    Without start/end the whole file is read and the header line is skipped.
+    With them only the byte range [start, end) is read, which must begin and
+    end on record boundaries (see shard_boundaries). Line numbers are then
+    relative to the start of the range. Either way the file is streamed, not
+    read into memory.
+    """
+    with open(path, "rb") as fh:
+        raw = fh if start is None else io.BufferedReader(_RangeReader(fh, start, end))
+        reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline=""))
+        if start is None:
+            next(reader, None)
+        for row in reader:
+            if row:
+                yield reader.line_num, _to_record(row)
+
+
+def shard_boundaries(path: str, shards: int) -> List[Tuple[int, int]]:
+    """Split the file after its header into about `shards` byte ranges.
+
+    A range only ends on a newline outside of quotes, so no quoted multi-line
+    field is cut in two. Tracking the quote parity per line is enough because
+    escaped quotes ("") do not change it.
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as fh:
+        pos = len(fh.readline())
+        bounds = [pos]
+        step = max(1, (size - pos) // max(1, shards))
+        target = pos + step
+        inquote = False
+        for line in fh:
+            pos += len(line)
+            if line.count(b'"') % 2:
+                inquote = not inquote
+            if not inquote and pos >= target and pos < size:
+                bounds.append(pos)
+                target = pos + step
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def _count(records: Iterator[Tuple[int, NRD2Record]]) -> Counter:
+    counts = Counter()
+    for _, rec in records:
+        counts[rec.reason if rec.reason in REASONS else "unknown"] += 1
+    return counts
+
+
+def _count_range(args: Tuple[str, int, int]) -> Counter:
+    path, start, end = args
+    return _count(iter_records(path, start, end))
+
+
+def count_reasons(path: str, workers: int = 1) -> Counter:
+    """Count the records of the file by reason; anything else counts as unknown."""
+    if workers <= 1:
+        return _count(iter_records(path))
+    counts = Counter()
+    ranges = [(path, a, b) for a, b in shard_boundaries(path, workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_count_range, ranges):
+            counts.update(part)
+    return counts
+
+# ── Entry point ───────────────────────────────────────────────────────────────
+
+LISTING = {
+    "added":      lambda line, r: f"Added....... {r.domainName}, {r.registrarName}, {line}",
+    "updated":    lambda line, r: f"Updated..... {r.domainName}",
+    "dropped":    lambda line, r: f"Deleted..... {r.domainName}",
+    "discovered": lambda line, r: f"Discovered.. {r.domainName}, {r.registrarName}",
+}
+
+
+def list_and_count(path: str) -> Counter:
+    counts = Counter()
+    out = []
+    for line, rec in iter_records(path):
+        if rec.reason in LISTING:
+            counts[rec.reason] += 1
+            out.append(LISTING[rec.reason](line, rec))
+            if len(out) >= 1000:
+                print("\n".join(out))
+                out.clear()
+        else:
+            counts["unknown"] += 1
+    if out:
+        print("\n".join(out))
+    return counts
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Count the records of an NRD 2.0 Ultimate file by reason.")
+    parser.add_argument("input_file", help="NRD 2.0 Ultimate csv file.")
+    parser.add_argument("--list", action="store_true",
+                        help="Print a line for every record, like nrd2-parse-ultimate.sh.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Count with this many processes on byte-range shards of the file "
+                             "(0 means one per CPU core). Ignored with --list.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        if args.list:
+            counts = list_and_count(args.input_file)
+        else:
+            workers = args.workers if args.workers > 0 else os.cpu_count()
+            counts = count_reasons(args.input_file, workers)
+
+        print(f"Added     : {counts['added']}")
+        print(f"Dropped   : {counts['dropped']}")
+        print(f"Updated   : {counts['updated']}")
+        print(f"Discovered: {counts['discovered']}")
+        print(f"Unknown   : {counts['unknown']}")
+        print("Done")
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Output closed early (e.g. piped into head): stop quietly. Point stdout
+        # at devnull so the flush at interpreter exit does not fail again.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
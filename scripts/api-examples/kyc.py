@@ -13,26 +13,53 @@ Requirements:
 
 Usage:
     python kyc_refactored.py [email_address]
+    python kyc_refactored.py --batch emails.txt --output reports.jsonl [--concurrency 20]
+    python kyc_refactored.py --serve 127.0.0.1:8080   # then GET /kyc?email=...
+    python kyc_refactored.py --geo-csv geo.v4.csv --netblocks-csv ip_netblocks.full.blocks.csv.gz \
+        --threat-feed tidf.malicious-ips.v4.csv.gz [email_address]
     
 Environment Variables:
     WHOISXML_API_KEY: Your WHOISXMLAPI.com API key (required)
+    KYC_GEO_CSV, KYC_NETBLOCKS_CSV, KYC_THREAT_FEEDS: local data feed files to use
+        instead of the API (several separated by os.pathsep)
 """
 
 from __future__ import annotations
 
+import argparse
 import asyncio
+import cProfile
+import csv
+import gzip
+import ipaddress
 import json
 import os
+import random
 import sys
+import threading
 import time
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_right
 from collections import Counter
-from dataclasses import dataclass, field
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
-from typing import Any
-from urllib.parse import quote
+from itertools import chain
+from typing import Any, Awaitable, Callable, Iterable, Iterator, TypeVar
+from urllib.parse import urlsplit
 
 import aiohttp
+from aiohttp import web
+
+try:
+    import orjson  # optional, speeds up to_json_bytes()
+except ImportError:
+    orjson = None
 
 # WHOISXMLAPI modules
 import domainreputation as dr
@@ -43,6 +70,8 @@ import simple_geoip as geoip
 import whoisapi as who
 import whoishistory as whohist
 
+T = TypeVar("T")
+
 
 # =============================================================================
 # Configuration
@@ -59,6 +88,12 @@ class Config:
     THREAT_INTEL_URL = "https://threat-intelligence.whoisxmlapi.com/api/v1"
     SSL_CERT_URL = "https://ssl-certificates.whoisxmlapi.com/api/v1"
     
+    # Local data feed files (.csv or .csv.gz; several separated by os.pathsep).
+    # Lookups a loaded feed can answer never reach the API.
+    NETBLOCKS_CSV: str = os.environ.get("KYC_NETBLOCKS_CSV", "")  # ip_netblocks.*.full.blocks.csv
+    GEO_CSV: str = os.environ.get("KYC_GEO_CSV", "")              # IP geolocation feed (v4/v6)
+    THREAT_FEEDS: str = os.environ.get("KYC_THREAT_FEEDS", "")    # tidf.*.malicious-{ips,domains,cidrs}*.csv
+    
     # Thresholds
     REPUTATION_SCORE_THRESHOLD = 72
     NEW_DOMAIN_DAYS_THRESHOLD = 30
@@ -67,6 +102,47 @@ class Config:
     MAX_CONCURRENT_REQUESTS = 10
     REQUEST_TIMEOUT = 30
     
+    # Retries of API requests on 429/5xx/connection errors, with jittered
+    # exponential backoff (or the server's Retry-After, up to MAX_RETRY_AFTER)
+    MAX_RETRIES = 3
+    RETRY_BACKOFF_BASE = 0.5
+    RETRY_BACKOFF_MAX = 8.0
+    MAX_RETRY_AFTER = 30.0
+    
+    # Hedging: seconds after which a second copy of a slow lookup request is
+    # sent (threat intel, geolocation, SSL); None disables it
+    HEDGE_AFTER: float | None = None
+    
+    # Circuit breaker per API host: consecutive failures before failing fast,
+    # and seconds before a trial request is let through again
+    BREAKER_FAILURES = 5
+    BREAKER_COOLDOWN = 30.0
+    
+    # Bulk mode (--batch): emails in flight, and requests in flight across them
+    # (the latter also applies to service mode)
+    BATCH_CONCURRENCY = 20
+    BATCH_MAX_CONCURRENT_REQUESTS = 50
+    
+    # Service mode (--serve): seconds idle API connections are kept open
+    SERVICE_KEEPALIVE = 120
+    
+    # Record a Span for every API/SDK call and cache lookup on the reports
+    # (always on for a single email, --trace for bulk and service mode)
+    TRACE = False
+    
+    # Cache lifetimes (seconds) for results shared between emails in bulk and
+    # service mode. A single email is checked without a cache, so they do not
+    # apply there.
+    CACHE_TTLS = {
+        "dns": 3600,         # NS/A records
+        "ip": 86400,         # geolocation and netblock of an IP
+        "mx_count": 604800,  # domains on an MX host (stable, and huge for provider hosts)
+        "domain": 86400,     # reputation, WHOIS, WHOIS history
+        "ssl": 86400,
+        "threat": 3600,
+    }
+    CACHE_EMPTY_TTL = 300
+    
     @classmethod
     def validate(cls) -> None:
         """Validate required configuration."""
@@ -97,6 +173,18 @@ class APIError(KYCError):
         self.status_code = status_code
 
 
+class TransientAPIError(APIError):
+    """Raised for API failures worth retrying (429, 5xx, connection errors)."""
+    def __init__(self, message: str, status_code: int | None = None, retry_after: float | None = None):
+        super().__init__(message, status_code)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(APIError):
+    """Raised without a request while an API host's circuit breaker is open."""
+    pass
+
+
 class ValidationError(KYCError):
     """Raised when email validation fails."""
     pass
@@ -106,6 +194,20 @@ class ValidationError(KYCError):
 # Data Classes
 # =============================================================================
 
+# The result models are slotted on Python 3.10+, as bulk runs hold many
+# thousands of them. The leaf models are also frozen: caches and local feeds
+# hand the same instance to many reports.
+_SLOTS: dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def _intern_fields(obj: Any, *names: str) -> None:
+    """Intern low-cardinality string fields (countries, AS names, ...) of a model."""
+    for name in names:
+        value = getattr(obj, name)
+        if isinstance(value, str):
+            object.__setattr__(obj, name, sys.intern(value))
+
+
 class CheckStatus(Enum):
     """Status of various email checks."""
     PASSED = "passed"
@@ -113,13 +215,16 @@ class CheckStatus(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class GeoLocation:
     """Geographic location data."""
     country: str = "Unknown"
     region: str = "Unknown"
     city: str = "Unknown"
     
+    def __post_init__(self) -> None:
+        _intern_fields(self, "country", "region", "city")
+    
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> GeoLocation:
         location = data.get("location", {})
@@ -130,14 +235,17 @@ class GeoLocation:
         )
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class NetBlockInfo:
     """Network block information."""
     asn: int = 0
     name: str = "Unknown"
+    
+    def __post_init__(self) -> None:
+        _intern_fields(self, "name")
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class ThreatIntelResult:
     """Threat intelligence data for an IOC."""
     value: str
@@ -145,9 +253,12 @@ class ThreatIntelResult:
     last_seen: str
     threat_type: str
     ioc_type: str
+    
+    def __post_init__(self) -> None:
+        _intern_fields(self, "threat_type", "ioc_type")
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class SSLCertInfo:
     """SSL certificate information."""
     ip: str
@@ -161,9 +272,12 @@ class SSLCertInfo:
     issuer_country: str
     organization: str
     netblock: NetBlockInfo
+    
+    def __post_init__(self) -> None:
+        _intern_fields(self, "validation_type", "issuer_country", "organization")
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class EmailVerificationResult:
     """Results of email verification checks."""
     email_address: str
@@ -220,7 +334,7 @@ class EmailVerificationResult:
         return True, ""
 
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class DNSRecordInfo:
     """DNS record information with geo and netblock data."""
     hostname: str
@@ -229,7 +343,38 @@ class DNSRecordInfo:
     netblock: NetBlockInfo | None = None
 
 
-@dataclass 
+@dataclass(**_SLOTS)
+class StageTiming:
+    """Timing of one KYC pipeline stage (seconds from the start of the run)."""
+    name: str
+    start: float
+    duration: float
+    status: str = "ok"  # ok / error / skipped
+
+
+@dataclass(**_SLOTS)
+class Span:
+    """One traced call of a KYC run (seconds from the start of the run)."""
+    name: str       # http / sdk / cache
+    endpoint: str   # API host and path, SDK method, or cache kind:key
+    start: float
+    duration: float = 0.0
+    status: str = "ok"  # HTTP status code, ok, or the exception raised
+    bytes: int = 0
+    cache: str = ""  # hit / miss / coalesced for cache lookups
+
+
+@dataclass(**_SLOTS)
+class RequestMetrics:
+    """API request counters of one KYC run."""
+    requests: int = 0
+    retries: int = 0
+    hedged: int = 0
+    short_circuited: int = 0
+    degraded: list[str] = field(default_factory=list)  # checks that fell back to an empty result
+
+
+@dataclass(**_SLOTS)
 class KYCReport:
     """Complete KYC verification report."""
     email: str
@@ -250,23 +395,142 @@ class KYCReport:
     countries_seen: list[str] = field(default_factory=list)
     errors: list[str] = field(default_factory=list)
     elapsed_time: float = 0.0
+    stage_timings: list[StageTiming] = field(default_factory=list)
+    api_metrics: RequestMetrics = field(default_factory=RequestMetrics)
+    started_at: float = 0.0  # Unix time
+    spans: list[Span] = field(default_factory=list)
 
 
 # =============================================================================
 # Async HTTP Client
 # =============================================================================
 
+# Request counters of the KYC run in progress; set by KYCProcessor.process_email
+_request_metrics: ContextVar[RequestMetrics | None] = ContextVar("kyc_request_metrics", default=None)
+
+
+# Spans of the KYC run in progress (with the run's perf_counter origin), if traced
+_trace: ContextVar[tuple[list[Span], float] | None] = ContextVar("kyc_trace", default=None)
+
+
+@contextmanager
+def traced(name: str, endpoint: str) -> Iterator[Span]:
+    """
+    Time the enclosed call as a Span of the current run. The caller may set
+    status/bytes/cache on the yielded span; it is only kept when tracing.
+    """
+    trace = _trace.get()
+    started = time.perf_counter()
+    span = Span(name, endpoint, started - trace[1] if trace else 0.0)
+    try:
+        yield span
+    except BaseException as e:
+        if span.status == "ok":
+            span.status = type(e).__name__
+        raise
+    finally:
+        if trace is not None:
+            span.duration = time.perf_counter() - started
+            trace[0].append(span)
+
+
+def note_degraded(check: str, error: Exception) -> None:
+    """Record on the current report that a check fell back to an empty result."""
+    metrics = _request_metrics.get()
+    if metrics is not None:
+        metrics.degraded.append(f"{check} ({error})")
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """
+    Retry-After is either delta-seconds or an HTTP date; None if absent or unparseable.
+    
+    The scripts are standalone, so scripts/firstwatch/advanced/fw.py has a copy; keep the two identical.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one API host.
+    
+    After `threshold` failed requests in a row the circuit opens and requests
+    fail fast for `cooldown` seconds. Then one trial request is let through;
+    its outcome closes the circuit or opens it again. Only used from the
+    event loop, so no locking.
+    """
+    
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+    
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._trial or time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        self._trial = True
+        return True
+    
+    def record(self, ok: bool) -> None:
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+        self._trial = False
+    
+    def release(self) -> None:
+        """End a request without an outcome (cancelled), freeing the trial slot."""
+        self._trial = False
+
+
 class AsyncAPIClient:
-    """Async HTTP client with connection pooling and rate limiting."""
+    """
+    Async HTTP client with connection pooling and rate limiting.
+    
+    get_json() retries 429/5xx/connection errors with jittered backoff
+    (honouring Retry-After), can hedge slow requests, and fails fast while
+    a host's circuit breaker is open. Counters go to the RequestMetrics of
+    the KYC run in progress and to `stats` for the client's lifetime.
+    """
+    
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
     
-    def __init__(self, api_key: str, max_concurrent: int = 10, timeout: int = 30):
+    def __init__(self, api_key: str, max_concurrent: int = 10, timeout: int = 30,
+                 max_retries: int | None = None, hedge_after: float | None = None,
+                 keepalive: float | None = None):
         self.api_key = api_key
         self.semaphore = asyncio.Semaphore(max_concurrent)
         self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.keepalive = keepalive
+        self.max_retries = Config.MAX_RETRIES if max_retries is None else max_retries
+        self.hedge_after = Config.HEDGE_AFTER if hedge_after is None else hedge_after
+        self.stats = Counter()
+        self._breakers: dict[str, CircuitBreaker] = {}
         self._session: aiohttp.ClientSession | None = None
     
     async def __aenter__(self) -> AsyncAPIClient:
-        self._session = aiohttp.ClientSession(timeout=self.timeout)
+        connector = aiohttp.TCPConnector(keepalive_timeout=self.keepalive) if self.keepalive else None
+        self._session = aiohttp.ClientSession(timeout=self.timeout, connector=connector)
         return self
     
     async def __aexit__(self, *args) -> None:
@@ -279,20 +543,465 @@ class AsyncAPIClient:
             raise RuntimeError("Client not initialized. Use 'async with' context.")
         return self._session
     
-    async def get_json(self, url: str, params: dict[str, str] | None = None) -> dict[str, Any]:
-        """Make an async GET request and return JSON response."""
-        async with self.semaphore:
-            params = params or {}
-            params["apiKey"] = self.api_key
-            
+    def _count(self, name: str) -> None:
+        self.stats[name] += 1
+        metrics = _request_metrics.get()
+        if metrics is not None:
+            setattr(metrics, name, getattr(metrics, name) + 1)
+    
+    def _breaker(self, url: str) -> CircuitBreaker:
+        host = urlsplit(url).netloc
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(Config.BREAKER_FAILURES, Config.BREAKER_COOLDOWN)
+        return breaker
+    
+    async def get_json(self, url: str, params: dict[str, str] | None = None, hedge: bool = False) -> dict[str, Any]:
+        """
+        Make an async GET request and return JSON response.
+        
+        hedge: the request is an idempotent lookup whose copy may be sent
+        after Config.HEDGE_AFTER seconds (first answer wins).
+        """
+        query = {**(params or {}), "apiKey": self.api_key}
+        breaker = self._breaker(url)
+        
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpenError(f"{urlsplit(url).netloc} is failing, not retrying for now")
             try:
-                async with self.session.get(url, params=params) as response:
-                    if response.status != 200:
-                        text = await response.text()
-                        raise APIError(f"API error: {text}", response.status)
-                    return await response.json()
-            except aiohttp.ClientError as e:
-                raise APIError(f"Request failed: {e}")
+                if hedge and self.hedge_after is not None:
+                    data = await self._hedged(url, query)
+                else:
+                    data = await self._attempt(url, query)
+            except TransientAPIError as e:
+                breaker.record(False)
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+                if e.retry_after is not None:
+                    delay = min(e.retry_after, Config.MAX_RETRY_AFTER)
+                else:
+                    # Exponential backoff with equal jitter so retries spread out
+                    cap = min(Config.RETRY_BACKOFF_MAX, Config.RETRY_BACKOFF_BASE * 2 ** attempt)
+                    delay = cap / 2 + random.uniform(0, cap / 2)
+                await asyncio.sleep(delay)
+                continue
+            except APIError:
+                # The host answered; the request itself was bad
+                breaker.record(True)
+                raise
+            except BaseException:
+                # Cancelled or failed unexpectedly: let a later request be the trial
+                breaker.release()
+                raise
+            breaker.record(True)
+            return data
+        raise AssertionError("unreachable")
+    
+    async def _attempt(self, url: str, query: dict[str, str]) -> dict[str, Any]:
+        """One GET request."""
+        parts = urlsplit(url)
+        async with self.semaphore:
+            self._count("requests")
+            with traced("http", parts.netloc + parts.path) as span:
+                try:
+                    async with self.session.get(url, params=query) as response:
+                        span.status = str(response.status)
+                        span.bytes = len(await response.read())
+                        if response.status != 200:
+                            text = await response.text()
+                            if response.status in self.RETRY_STATUSES:
+                                raise TransientAPIError(f"API error: {text}", response.status,
+                                                        _parse_retry_after(response.headers.get("Retry-After")))
+                            raise APIError(f"API error: {text}", response.status)
+                        return await response.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    raise TransientAPIError(f"Request failed: {str(e) or type(e).__name__}")
+    
+    async def _hedged(self, url: str, query: dict[str, str]) -> dict[str, Any]:
+        """_attempt(), plus a second copy if the first is slower than hedge_after; first success wins."""
+        first = asyncio.create_task(self._attempt(url, query))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                self._count("hedged")
+                tasks.add(asyncio.create_task(self._attempt(url, query)))
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def run_sync(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking SDK call in a worker thread.
+        
+        Holds the same semaphore as get_json(), so MAX_CONCURRENT_REQUESTS
+        bounds SDK and aiohttp requests together, and the event loop keeps
+        serving the other lookups meanwhile.
+        """
+        async with self.semaphore:
+            with traced("sdk", getattr(func, "__qualname__", repr(func))):
+                return await asyncio.to_thread(func, *args)
+
+
+# =============================================================================
+# Local Data Feeds
+# =============================================================================
+
+class IntervalIndex:
+    """
+    Sorted, non-overlapping integer ranges mapped to values, searched with bisect.
+    
+    Ranges may nest (a /16 and the /24s inside it); build() flattens them so
+    every address maps to the most specific range containing it. IPv4
+    bounds are kept in compact arrays, IPv6 bounds in lists.
+    """
+    
+    def __init__(self):
+        self._starts: dict[int, Any] = {4: array("Q"), 6: []}
+        self._ends: dict[int, Any] = {4: array("Q"), 6: []}
+        self._values: dict[int, list[Any]] = {4: [], 6: []}
+    
+    def __len__(self) -> int:
+        return len(self._values[4]) + len(self._values[6])
+    
+    @classmethod
+    def build(cls, ranges: Iterable[tuple[int, int, int, Any]]) -> IntervalIndex:
+        """Build from (ip version, first, last, value) tuples in any order."""
+        index = cls()
+        by_version: dict[int, list[tuple[int, int, Any]]] = {4: [], 6: []}
+        for version, first, last, value in ranges:
+            by_version[version].append((first, last, value))
+        for version, blocks in by_version.items():
+            blocks.sort(key=lambda b: (b[0], -b[1]))
+            index._flatten(version, blocks)
+        return index
+    
+    def _flatten(self, version: int, blocks: list[tuple[int, int, Any]]) -> None:
+        starts, ends, values = self._starts[version], self._ends[version], self._values[version]
+        
+        def emit(first: int, last: int, value: Any) -> None:
+            if first > last:
+                return
+            if values and values[-1] is value and ends[-1] + 1 == first:
+                ends[-1] = last
+                return
+            starts.append(first)
+            ends.append(last)
+            values.append(value)
+        
+        stack: list[tuple[int, Any]] = []  # (last, value) of the ranges open at `cursor`
+        cursor = 0
+        for first, last, value in blocks:
+            while stack and stack[-1][0] < first:
+                end, outer = stack.pop()
+                emit(cursor, end, outer)
+                cursor = max(cursor, end + 1)
+            if stack:
+                emit(cursor, first - 1, stack[-1][1])
+            cursor = max(cursor, first)
+            stack.append((last, value))
+        while stack:
+            end, outer = stack.pop()
+            emit(cursor, end, outer)
+            cursor = max(cursor, end + 1)
+    
+    def lookup(self, ip: str) -> Any | None:
+        """Value of the most specific range containing ip, or None."""
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        number = int(address)
+        starts = self._starts[address.version]
+        i = bisect_right(starts, number) - 1
+        if i >= 0 and number <= self._ends[address.version][i]:
+            return self._values[address.version][i]
+        return None
+
+
+def _open_feed(path: str):
+    """Open a (possibly gzipped) CSV feed file for reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", newline="", encoding="utf-8")
+    return open(path, newline="", encoding="utf-8")
+
+
+def feed_paths(value: str) -> list[str]:
+    """Feed files from a Config setting; several are separated by os.pathsep."""
+    return [path for path in value.split(os.pathsep) if path]
+
+
+def _is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def load_netblock_index(paths: list[str]) -> IntervalIndex:
+    """
+    Build an IntervalIndex of NetBlockInfo from the IP netblocks feed
+    (ip_netblocks.YYYY-MM-DD.full.blocks.csv[.gz], see scripts/ipnetblocks).
+    
+    Columns are taken from the header (inetnumFirst, inetnumLast, asn,
+    as_name) or, without one, from the positions build_tree.py uses.
+    """
+    infos: dict[tuple[int, str], NetBlockInfo] = {}
+    
+    def rows(path: str):
+        with _open_feed(path) as f:
+            reader = csv.reader(f)
+            first_row = next(reader, None)
+            if first_row is None:
+                return
+            if "inetnumFirst" in first_row:
+                cols = [first_row.index(name) for name in ("inetnumFirst", "inetnumLast", "asn", "as_name")]
+                data = reader
+            else:
+                cols = [1, 2, 3, 7]
+                data = chain([first_row], reader)
+            lo, hi, asn_col, name_col = cols
+            for row in data:
+                try:
+                    first, last = int(row[lo]), int(row[hi])
+                    asn = int(row[asn_col] or 0)
+                except (IndexError, ValueError):
+                    continue
+                # One NetBlockInfo per AS, shared by all of its ranges
+                key = (asn, row[name_col])
+                info = infos.get(key)
+                if info is None:
+                    info = infos[key] = NetBlockInfo(asn=asn, name=row[name_col] or "Unknown")
+                yield (4 if last <= 0xFFFFFFFF else 6), first, last, info
+    
+    return IntervalIndex.build(chain.from_iterable(rows(path) for path in paths))
+
+
+def load_geo_index(paths: list[str]) -> IntervalIndex:
+    """
+    Build an IntervalIndex of GeoLocation from IP geolocation feed files
+    (IPv4 and/or IPv6, see scripts/geoip).
+    
+    Every row starts a range at its `mark` that runs up to the next row's
+    mark; the last one runs to the end of the address space.
+    """
+    locations: dict[tuple[str, str, str], GeoLocation] = {}
+    
+    def rows(path: str):
+        marks: list[tuple[int, GeoLocation]] = []
+        with _open_feed(path) as f:
+            for row in csv.DictReader(f):
+                try:
+                    mark = int(row["mark"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                key = (row.get("country") or "Unknown", row.get("region") or "Unknown", row.get("city") or "Unknown")
+                location = locations.get(key)
+                if location is None:
+                    location = locations[key] = GeoLocation(*key)
+                marks.append((mark, location))
+        if not marks:
+            return
+        marks.sort(key=lambda m: m[0])
+        version, top = (6, 2**128 - 1) if marks[-1][0] > 0xFFFFFFFF else (4, 2**32 - 1)
+        ends = [mark - 1 for mark, _ in marks[1:]] + [top]
+        for (first, location), last in zip(marks, ends):
+            yield version, first, last, location
+    
+    return IntervalIndex.build(chain.from_iterable(rows(path) for path in paths))
+
+
+class ThreatFeedIndex:
+    """
+    Threat Intelligence Data Feed records by IOC (see scripts/threat-intel).
+    
+    Loaded from the malicious-ips, malicious-domains and malicious-cidrs CSV
+    files. The feeds list every known malicious IOC, so for an IOC type that
+    was loaded a miss means "no records" and the API is not asked.
+    """
+    
+    def __init__(self):
+        self.exact: dict[str, list[ThreatIntelResult]] = {}
+        self.cidrs: IntervalIndex | None = None
+        self.covers: set[str] = set()  # "ip" and/or "domain"
+        self.stats = Counter()
+    
+    def __len__(self) -> int:
+        return len(self.exact) + (len(self.cidrs) if self.cidrs else 0)
+    
+    @classmethod
+    def load(cls, paths: list[str]) -> ThreatFeedIndex:
+        """Read CSV feed files (ioc, threatType, firstSeen, lastSeen; header optional)."""
+        index = cls()
+        cidr_ranges = []
+        for path in paths:
+            with _open_feed(path) as f:
+                reader = csv.reader(f)
+                for row in reader:
+                    if not row or (reader.line_num == 1 and "threatType" in row):
+                        continue
+                    value = row[0].strip().lower()
+                    threat_type, first_seen, last_seen = (row[1:4] + ["", "", ""])[:3]
+                    if "/" in value:
+                        try:
+                            network = ipaddress.ip_network(value, strict=False)
+                        except ValueError:
+                            continue
+                        result = ThreatIntelResult(value, first_seen, last_seen, threat_type, "cidr")
+                        cidr_ranges.append((network.version, int(network.network_address),
+                                            int(network.broadcast_address), [result]))
+                        index.covers.add("ip")
+                        continue
+                    ioc_type = "ip" if _is_ip(value) else "domain"
+                    index.exact.setdefault(value, []).append(
+                        ThreatIntelResult(value, first_seen, last_seen, threat_type, ioc_type)
+                    )
+                    index.covers.add(ioc_type)
+        if cidr_ranges:
+            index.cidrs = IntervalIndex.build(cidr_ranges)
+        return index
+    
+    def lookup(self, ioc: str) -> list[ThreatIntelResult] | None:
+        """Feed records for an IOC, or None if the feeds do not cover its type."""
+        ioc = ioc.lower()
+        is_ip = _is_ip(ioc)
+        if ("ip" if is_ip else "domain") not in self.covers:
+            return None
+        self.stats["local"] += 1
+        results = list(self.exact.get(ioc, ()))
+        if is_ip and self.cidrs is not None:
+            results.extend(self.cidrs.lookup(ioc) or ())
+        return results
+
+
+class FeedBackedService(ABC):
+    """
+    Per-IP lookup answered from a local IntervalIndex when one is loaded,
+    and otherwise through one pooled SDK client shared by every caller.
+    
+    Subclasses create the client and implement lookup_api().
+    """
+    
+    name = ""
+    
+    def __init__(self, api_key: str, index: IntervalIndex | None = None):
+        self.api_key = api_key
+        self.index = index
+        self.stats = Counter()
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+    
+    @abstractmethod
+    def _create_client(self) -> Any:
+        """The SDK client, created on first use."""
+    
+    @property
+    def client(self) -> Any:
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._create_client()
+            return self._client
+    
+    @abstractmethod
+    def lookup_api(self, ip: str) -> Any:
+        """Result from the API (blocking)."""
+    
+    def lookup_local(self, ip: str) -> Any | None:
+        """Result from the local index, or None if it cannot answer."""
+        if self.index is None:
+            return None
+        result = self.index.lookup(ip)
+        if result is not None:
+            self.stats["local"] += 1
+        return result
+    
+    def lookup_sync(self, ip: str) -> Any:
+        """Blocking lookup: local index first, then the API."""
+        local = self.lookup_local(ip)
+        if local is not None:
+            return local
+        self.stats["api"] += 1
+        return self.lookup_api(ip)
+    
+    async def lookup(self, ip: str, client: AsyncAPIClient) -> Any:
+        """Async lookup; index hits return at once, API calls run via client.run_sync."""
+        local = self.lookup_local(ip)
+        if local is not None:
+            return local
+        self.stats["api"] += 1
+        return await client.run_sync(self.lookup_api, ip)
+
+
+class NetBlockService(FeedBackedService):
+    """Netblock (ASN) of an IP: netblocks feed index, then the IP Netblocks API."""
+    
+    name = "netblock"
+    
+    def _create_client(self) -> ipnb.Client:
+        return ipnb.Client(self.api_key)
+    
+    def lookup_api(self, ip: str) -> NetBlockInfo:
+        try:
+            response = self.client.get(ip)
+            if response.count > 0:
+                as_info = response["inetnums"][0]["AS"]
+                return NetBlockInfo(asn=as_info["asn"], name=as_info["name"])
+        except Exception:
+            pass
+        return NetBlockInfo()
+
+
+class GeoIPService(FeedBackedService):
+    """Location of an IP: geolocation feed index, then the IP Geolocation API."""
+    
+    name = "geo"
+    
+    def _create_client(self) -> geoip.GeoIP:
+        return geoip.GeoIP(self.api_key)
+    
+    def lookup_api(self, ip: str) -> GeoLocation:
+        try:
+            return GeoLocation.from_dict(self.client.lookup(ip))
+        except Exception:
+            return GeoLocation()
+
+
+@dataclass
+class LookupBackends:
+    """Where IP geolocation, netblock and threat lookups are answered from."""
+    geo: GeoIPService
+    netblocks: NetBlockService
+    threat_feed: ThreatFeedIndex | None = None
+    
+    @classmethod
+    def create(cls, api_key: str, geo_files: list[str] | None = None,
+               netblock_files: list[str] | None = None,
+               threat_files: list[str] | None = None) -> LookupBackends:
+        """Load the given feed files; lookups without a feed go to the API."""
+        return cls(
+            geo=GeoIPService(api_key, load_geo_index(geo_files) if geo_files else None),
+            netblocks=NetBlockService(api_key, load_netblock_index(netblock_files) if netblock_files else None),
+            threat_feed=ThreatFeedIndex.load(threat_files) if threat_files else None,
+        )
+    
+    def stats(self) -> Counter:
+        """Lookups answered from the feeds (local) and from the API."""
+        total = self.geo.stats + self.netblocks.stats
+        if self.threat_feed is not None:
+            total.update(self.threat_feed.stats)
+        return total
 
 
 # =============================================================================
@@ -317,7 +1026,8 @@ class EmailVerificationService:
         """Get geolocation data for an email address."""
         data = await self.client.get_json(
             Config.GEO_LOCATION_URL,
-            {"email": email}
+            {"email": email},
+            hedge=True
         )
         return GeoLocation.from_dict(data)
 
@@ -325,15 +1035,21 @@ class EmailVerificationService:
 class ThreatIntelService:
     """Service for threat intelligence lookups."""
     
-    def __init__(self, client: AsyncAPIClient):
+    def __init__(self, client: AsyncAPIClient, feed: ThreatFeedIndex | None = None):
         self.client = client
+        self.feed = feed
     
     async def lookup(self, ioc: str) -> list[ThreatIntelResult]:
-        """Look up threat intelligence for an IOC (IP or domain)."""
+        """Look up threat intelligence for an IOC (IP or domain), from the local feed if it covers it."""
+        if self.feed is not None:
+            local = self.feed.lookup(ioc)
+            if local is not None:
+                return local
         try:
             data = await self.client.get_json(
                 Config.THREAT_INTEL_URL,
-                {"ioc": ioc}
+                {"ioc": ioc},
+                hedge=True
             )
             
             results = []
@@ -346,7 +1062,8 @@ class ThreatIntelService:
                     ioc_type=item.get("iocType", ""),
                 ))
             return results
-        except APIError:
+        except APIError as e:
+            note_degraded(f"threat_intel:{ioc}", e)
             return []
     
     async def lookup_batch(self, iocs: list[str]) -> dict[str, list[ThreatIntelResult]]:
@@ -363,16 +1080,18 @@ class ThreatIntelService:
 class SSLCertService:
     """Service for SSL certificate lookups."""
     
-    def __init__(self, client: AsyncAPIClient, api_key: str):
+    def __init__(self, client: AsyncAPIClient, api_key: str, netblocks: NetBlockService | None = None):
         self.client = client
         self.api_key = api_key
+        self.netblocks = netblocks or NetBlockService(api_key)
     
     async def get_cert_info(self, domain: str) -> SSLCertInfo | None:
         """Get SSL certificate information for a domain."""
         try:
             data = await self.client.get_json(
                 Config.SSL_CERT_URL,
-                {"domainName": domain}
+                {"domainName": domain},
+                hedge=True
             )
             
             # Check for error response
@@ -404,21 +1123,15 @@ class SSLCertService:
                 organization=issuer.get("organization", ""),
                 netblock=netblock,
             )
-        except (APIError, KeyError):
+        except APIError as e:
+            note_degraded(f"ssl:{domain}", e)
+            return None
+        except KeyError:
             return None
     
     async def _get_netblock(self, ip: str) -> NetBlockInfo:
         """Get netblock info for an IP address."""
-        try:
-            ipnb_client = ipnb.Client(self.api_key)
-            response = ipnb_client.get(ip)
-            
-            if response.count > 0:
-                as_info = response["inetnums"][0]["AS"]
-                return NetBlockInfo(asn=as_info["asn"], name=as_info["name"])
-        except Exception:
-            pass
-        return NetBlockInfo()
+        return await self.netblocks.lookup(ip, self.client)
 
 
 # =============================================================================
@@ -426,17 +1139,22 @@ class SSLCertService:
 # =============================================================================
 
 class SyncAPIServices:
-    """Wrapper for synchronous WHOISXMLAPI libraries."""
+    """
+    Wrapper for synchronous WHOISXMLAPI libraries.
     
-    def __init__(self, api_key: str):
+    The methods block for a full HTTP round-trip; from async code call them
+    through AsyncAPIClient.run_sync() so they do not stall the event loop.
+    """
+    
+    def __init__(self, api_key: str, netblocks: NetBlockService | None = None, geo: GeoIPService | None = None):
         self.api_key = api_key
+        self.netblocks = netblocks or NetBlockService(api_key)
+        self.geo = geo or GeoIPService(api_key)
         self._dns_client = dns.Client(api_key)
-        self._geo_client = geoip.GeoIP(api_key)
         self._whois_client = who.Client(api_key=api_key)
         self._whois_history_client = whohist.ApiClient(api_key)
         self._reputation_client = dr.Client(api_key)
         self._rmx_client = rmx.Client(api_key)
-        self._netblock_client = ipnb.Client(api_key)
     
     def get_dns_records(self, domain: str, record_type: str) -> list[str]:
         """Get DNS records for a domain."""
@@ -460,24 +1178,12 @@ class SyncAPIServices:
         return self.get_dns_records(hostname, 'A')
     
     def get_geo_by_ip(self, ip: str) -> GeoLocation:
-        """Get geolocation for an IP address."""
-        try:
-            data = self._geo_client.lookup(ip)
-            return GeoLocation.from_dict(data)
-        except Exception:
-            return GeoLocation()
+        """Get geolocation for an IP address (local index first, see GeoIPService)."""
+        return self.geo.lookup_sync(ip)
     
     def get_netblock(self, ip: str) -> NetBlockInfo:
-        """Get netblock information for an IP address."""
-        try:
-            response = self._netblock_client.get(ip)
-            if response.count > 0:
-                as_info = response["inetnums"][0]["AS"]
-                return NetBlockInfo(asn=as_info["asn"], name=as_info["name"])
-        except Exception as e:
-            # Uncomment for debugging: print(f"Netblock error for {ip}: {e}")
-            pass
-        return NetBlockInfo()
+        """Get netblock information for an IP address (local index first, see NetBlockService)."""
+        return self.netblocks.lookup_sync(ip)
     
     def get_domain_reputation(self, domain: str) -> int | None:
         """Get domain reputation score."""
@@ -531,188 +1237,468 @@ class SyncAPIServices:
             return 0
 
 
+# =============================================================================
+# Caching
+# =============================================================================
+
+class TTLCache:
+    """
+    In-memory cache for lookups shared between KYC runs.
+    
+    Entries expire after the TTL configured for their kind in
+    Config.CACHE_TTLS; empty results (no records, unknown location, failed
+    lookups the SDK wrappers turn into defaults) only live for
+    Config.CACHE_EMPTY_TTL so a transient failure is not kept for a day.
+    Concurrent requests for the same key share one lookup.
+    """
+    
+    def __init__(self, ttls: dict[str, float] | None = None, empty_ttl: float | None = None,
+                 max_entries: int = 100_000):
+        self.ttls = ttls if ttls is not None else Config.CACHE_TTLS
+        self.empty_ttl = Config.CACHE_EMPTY_TTL if empty_ttl is None else empty_ttl
+        self.max_entries = max_entries
+        self._entries: dict[tuple[str, str], tuple[float, Any]] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self.stats = Counter()
+    
+    @staticmethod
+    def _is_empty(value: Any) -> bool:
+        if not value:
+            return True
+        if hasattr(value, "__dataclass_fields__"):
+            try:
+                return value == type(value)()
+            except TypeError:  # no defaults, so never a placeholder
+                return False
+        return False
+    
+    async def get(self, kind: str, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """Return the cached value for (kind, key), or await compute() and cache it."""
+        with traced("cache", f"{kind}:{key}") as span:
+            return await self._get(kind, key, compute, span)
+    
+    async def _get(self, kind: str, key: str, compute: Callable[[], Awaitable[T]], span: Span) -> T:
+        k = (kind, key)
+        entry = self._entries.get(k)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.stats["hits"] += 1
+                span.cache = "hit"
+                return entry[1]
+            del self._entries[k]
+        
+        pending = self._inflight.get(k)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            span.cache = "coalesced"
+            return await asyncio.shield(pending)
+        
+        self.stats["misses"] += 1
+        span.cache = "miss"
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[k] = future
+        try:
+            value = await compute()
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(value)
+            ttl = self.empty_ttl if self._is_empty(value) else self.ttls.get(kind, 0)
+            if ttl > 0:
+                if len(self._entries) >= self.max_entries:
+                    self._evict()
+                self._entries[k] = (time.monotonic() + ttl, value)
+            return value
+        finally:
+            del self._inflight[k]
+    
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones if still full."""
+        now = time.monotonic()
+        for k in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[k]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+
+# =============================================================================
+# Task Graph
+# =============================================================================
+
+class TaskGraph:
+    """
+    Small DAG of async tasks.
+    
+    Each node names the nodes whose results it needs and starts as soon as
+    those have finished, so independent checks overlap and the run takes as
+    long as the longest dependency chain. If a node raises, the nodes that
+    depend on it (directly or not) are skipped. Timings for every node are
+    collected as StageTiming entries.
+    """
+    
+    def __init__(self):
+        self._nodes: dict[str, tuple[Callable[..., Any], tuple[str, ...]]] = {}
+    
+    def add(self, name: str, func: Callable[..., Any], needs: tuple[str, ...] = ()) -> None:
+        """Add a node; func is a coroutine function called with the results of `needs`, in order."""
+        for dep in needs:
+            if dep not in self._nodes:
+                raise ValueError(f"Node '{name}' needs unknown node '{dep}'")
+        self._nodes[name] = (func, needs)
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    async def run(self) -> tuple[dict[str, Any], dict[str, BaseException], list[StageTiming]]:
+        """Run all nodes; returns (results, errors, timings) keyed by node name."""
+        origin = time.perf_counter()
+        results: dict[str, Any] = {}
+        errors: dict[str, BaseException] = {}
+        timings: list[StageTiming] = []
+        tasks: dict[str, asyncio.Task] = {}
+        
+        async def run_node(name: str) -> None:
+            func, needs = self._nodes[name]
+            await asyncio.gather(*(tasks[dep] for dep in needs))
+            blocked = [dep for dep in needs if dep in errors]
+            if blocked:
+                errors[name] = errors[blocked[0]]
+                timings.append(StageTiming(name, time.perf_counter() - origin, 0.0, "skipped"))
+                return
+            
+            start = time.perf_counter()
+            try:
+                results[name] = await func(*(results[dep] for dep in needs))
+                status = "ok"
+            except Exception as e:
+                errors[name] = e
+                status = "error"
+            timings.append(StageTiming(name, start - origin, time.perf_counter() - start, status))
+        
+        # Nodes can only need nodes added before them, so this order is topological
+        for name in self._nodes:
+            tasks[name] = asyncio.create_task(run_node(name))
+        await asyncio.gather(*tasks.values())
+        
+        timings.sort(key=lambda t: t.start)
+        return results, errors, timings
+
+
 # =============================================================================
 # Main KYC Processor
 # =============================================================================
 
+def _host_key(hostname: str) -> str:
+    """Hostname as compared for deduplication (case-insensitive, no trailing dot)."""
+    return hostname.lower().rstrip(".")
+
+
 class KYCProcessor:
-    """Main processor for KYC verification."""
+    """
+    Main processor for KYC verification.
+    
+    One processor can serve many emails concurrently (see process_batch).
+    With a TTLCache, domain-, hostname- and IP-level lookups are shared
+    between the emails; per-email checks (verification, email geo) are not
+    cached.
+    """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: TTLCache | None = None, verbose: bool = True,
+                 backends: LookupBackends | None = None):
         self.api_key = api_key
-        self.sync_services = SyncAPIServices(api_key)
-        self.countries_seen: list[str] = []
+        self.backends = backends or LookupBackends.create(api_key)
+        self.sync_services = SyncAPIServices(api_key, self.backends.netblocks, self.backends.geo)
+        self.cache = cache
+        self.verbose = verbose
     
-    def _add_country(self, country: str) -> None:
+    def _log(self, *args: Any) -> None:
+        """Progress output; silent when processing in bulk."""
+        if self.verbose:
+            print(*args)
+    
+    def _add_country(self, report: KYCReport, country: str) -> None:
         """Track a country code seen during processing."""
         if country and country != "Unknown":
-            self.countries_seen.append(country)
+            report.countries_seen.append(country)
+    
+    async def _cached(self, kind: str, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """compute() through the shared cache, if there is one."""
+        if self.cache is None:
+            return await compute()
+        return await self.cache.get(kind, key, compute)
+    
+    def _sync(self, client: AsyncAPIClient, kind: str, func: Callable[..., T], *args: Any) -> Awaitable[T]:
+        """Cached SyncAPIServices call, run off the event loop."""
+        key = "|".join([func.__name__, *map(str, args)])
+        return self._cached(kind, key, lambda: client.run_sync(func, *args))
     
-    async def process_email(self, email: str) -> KYCReport:
+    async def _ip_lookup(self, client: AsyncAPIClient, service: FeedBackedService, ip: str) -> Any:
+        """FeedBackedService lookup; only API answers go through the cache."""
+        local = service.lookup_local(ip)
+        if local is not None:
+            return local
+        return await self._cached("ip", f"{service.name}|{ip}", lambda: service.lookup(ip, client))
+    
+    async def _threat_batch(self, threat_service: ThreatIntelService, iocs: list[str]) -> dict[str, list[ThreatIntelResult]]:
+        """Like ThreatIntelService.lookup_batch, with every IOC cached on its own."""
+        results = await asyncio.gather(
+            *(self._cached("threat", ioc, lambda ioc=ioc: threat_service.lookup(ioc)) for ioc in iocs),
+            return_exceptions=True,
+        )
+        return {ioc: result if isinstance(result, list) else [] for ioc, result in zip(iocs, results)}
+    
+    async def process_email(self, email: str, client: AsyncAPIClient | None = None) -> KYCReport:
         """
         Process full KYC verification for an email address.
         
+        The checks run as a TaskGraph: every lookup starts as soon as the
+        data it needs is there. Email verification gates the rest, so an
+        invalid address costs one API call.
+        
         Args:
             email: Email address to verify
+            client: Open client to share between emails (a new one is
+                    opened for this email if omitted)
             
         Returns:
             Complete KYC report
         """
+        if client is None:
+            async with AsyncAPIClient(
+                self.api_key,
+                max_concurrent=Config.MAX_CONCURRENT_REQUESTS,
+                timeout=Config.REQUEST_TIMEOUT
+            ) as client:
+                return await self.process_email(email, client)
+        
         start_time = time.perf_counter()
-        self.countries_seen = []
         
         domain = email.split('@')[1] if '@' in email else ""
         report = KYCReport(email=email, domain=domain)
         
-        async with AsyncAPIClient(
-            self.api_key,
-            max_concurrent=Config.MAX_CONCURRENT_REQUESTS,
-            timeout=Config.REQUEST_TIMEOUT
-        ) as client:
-            
-            # Initialize async services
-            email_service = EmailVerificationService(client)
-            threat_service = ThreatIntelService(client)
-            ssl_service = SSLCertService(client, self.api_key)
-            
-            # Step 1: Email verification
-            print("\n[1/6] Verifying email address...")
+        # AsyncAPIClient counts this run's retries etc. (and traces its calls) on the report
+        report.started_at = time.time()
+        metrics_token = _request_metrics.set(report.api_metrics)
+        trace_token = _trace.set((report.spans, start_time) if Config.TRACE else None)
+        try:
+            await self._run_checks(report, client)
+        finally:
+            _trace.reset(trace_token)
+            _request_metrics.reset(metrics_token)
+        
+        report.elapsed_time = time.perf_counter() - start_time
+        return report
+    
+    async def _run_checks(self, report: KYCReport, client: AsyncAPIClient) -> None:
+        """Run the checks of process_email() and fill in the report."""
+        email, domain = report.email, report.domain
+        
+        # Initialize async services
+        email_service = EmailVerificationService(client)
+        threat_service = ThreatIntelService(client, self.backends.threat_feed)
+        ssl_service = SSLCertService(client, self.api_key, self.backends.netblocks)
+        sync = self.sync_services
+        
+        async def verify() -> EmailVerificationResult | None:
             try:
-                report.email_verification = await email_service.verify_email(email)
-                self._print_email_verification(report.email_verification)
-                
-                is_valid, reason = report.email_verification.is_valid()
-                if not is_valid:
-                    report.errors.append(f"Email validation failed: {reason}")
-                    print(f"      ❌ {reason}")
-                    report.elapsed_time = time.perf_counter() - start_time
-                    return report
-                
-                print("      ✓ Email verification passed")
-                
-                # Get email geolocation
-                report.email_geo = await email_service.get_geo_by_email(email)
-                if report.email_geo:
-                    self._add_country(report.email_geo.country)
-                    print(f"      Location: {report.email_geo.city}, {report.email_geo.region}, {report.email_geo.country}")
-                    
+                result = await email_service.verify_email(email)
             except APIError as e:
+                # Keep going without verification data, as before
                 report.errors.append(f"Email verification failed: {e}")
-                print(f"      ❌ Error: {e}")
-            
-            # Step 2: DNS record collection (NS and MX)
-            print("\n[2/6] Collecting DNS records...")
-            ns_hostnames = self.sync_services.get_dns_records(domain, 'NS')
-            mx_hostnames = report.email_verification.mx_records if report.email_verification else []
-            
-            print(f"      Found {len(ns_hostnames)} NS records, {len(mx_hostnames)} MX records")
-            
-            # Resolve all hostnames to IPs and get geo/netblock info
-            report.ns_records = self._resolve_dns_records(ns_hostnames, "NS")
-            report.mx_records = self._resolve_dns_records(mx_hostnames, "MX")
-            
-            # Get MX domain counts
-            for mx_record in report.mx_records:
-                count = self.sync_services.get_mx_domain_count(mx_record.hostname)
-                report.mx_domain_counts[mx_record.hostname] = count
-            
-            if not mx_hostnames:
-                report.errors.append("No MX records found - invalid email configuration")
-                print("      ❌ No MX records found")
-            
-            # Step 3: Domain reputation and WHOIS
-            print("\n[3/6] Checking domain reputation and WHOIS...")
-            
-            report.domain_reputation_score = self.sync_services.get_domain_reputation(domain)
-            if report.domain_reputation_score is not None:
-                status = "✓" if report.domain_reputation_score > Config.REPUTATION_SCORE_THRESHOLD else "⚠"
-                print(f"      {status} Reputation score: {report.domain_reputation_score}")
-            
-            whois_data = self.sync_services.get_whois(domain)
-            report.domain_age_days = whois_data.get("age_days")
-            report.whois_registrant = whois_data.get("registrant")
-            report.whois_registrar = whois_data.get("registrar")
-            report.whois_contact_email = whois_data.get("contact_email")
-            
-            if report.domain_age_days is not None:
-                if report.domain_age_days < Config.NEW_DOMAIN_DAYS_THRESHOLD:
-                    print(f"      ⚠ Domain is only {report.domain_age_days} days old")
-                else:
-                    print(f"      ✓ Domain is {report.domain_age_days} days old")
-            
-            report.whois_history_count = self.sync_services.get_whois_history_count(domain)
-            if report.whois_history_count:
-                print(f"      Historical WHOIS records: {report.whois_history_count}")
-            
-            # Step 4: Threat intelligence (concurrent batch lookups)
-            print("\n[4/6] Checking threat intelligence...")
-            
-            all_iocs = self._collect_iocs(domain, report)
-            report.threat_intel = await threat_service.lookup_batch(all_iocs)
-            
-            threats_found = sum(len(v) for v in report.threat_intel.values())
-            if threats_found:
-                print(f"      ⚠ Found {threats_found} threat intelligence records")
-            else:
-                print("      ✓ No threat intelligence records found")
-            
-            # Step 5: SSL certificate
-            print("\n[5/6] Checking SSL certificate...")
-            
-            report.ssl_cert = await ssl_service.get_cert_info(domain)
-            if report.ssl_cert:
-                self._add_country(report.ssl_cert.issuer_country)
-                print(f"      ✓ Valid from {report.ssl_cert.valid_from} to {report.ssl_cert.valid_to}")
-                print(f"      Issuer: {report.ssl_cert.organization} ({report.ssl_cert.issuer_country})")
-                
-                # Additional threat intel for SSL
-                if report.ssl_cert.ip:
-                    ssl_threat = await threat_service.lookup(report.ssl_cert.ip)
-                    if ssl_threat:
-                        report.threat_intel[f"ssl_ip:{report.ssl_cert.ip}"] = ssl_threat
+                return None
+            report.email_verification = result
+            is_valid, reason = result.is_valid()
+            if not is_valid:
+                raise ValidationError(reason)
+            return result
+        
+        async def email_geo(verification: EmailVerificationResult | None) -> GeoLocation | None:
+            if verification is None:
+                return None
+            return await email_service.get_geo_by_email(email)
+        
+        async def ns_hosts(_) -> list[str]:
+            return await self._sync(client, "dns", sync.get_dns_records, domain, 'NS')
+        
+        async def ns_records(hostnames: list[str]) -> list[DNSRecordInfo]:
+            return await self._resolve_dns_records(client, hostnames)
+        
+        async def mx_records(verification: EmailVerificationResult | None) -> list[DNSRecordInfo]:
+            hostnames = verification.mx_records if verification else []
+            return await self._resolve_dns_records(client, hostnames)
+        
+        async def mx_counts(verification: EmailVerificationResult | None) -> dict[str, int]:
+            # One reverse-MX query per distinct host, not per resolved IP; keyed by that host
+            hostnames = verification.mx_records if verification else []
+            unique = list(dict.fromkeys(_host_key(h) for h in hostnames))
+            return dict(zip(unique, await asyncio.gather(*(
+                self._sync(client, "mx_count", sync.get_mx_domain_count, host) for host in unique
+            ))))
+        
+        async def threat_domain(_) -> dict[str, list[ThreatIntelResult]]:
+            return await self._threat_batch(threat_service, [domain])
+        
+        async def threat_dns(ns: list[DNSRecordInfo], mx: list[DNSRecordInfo]) -> dict[str, list[ThreatIntelResult]]:
+            return await self._threat_batch(threat_service, self._collect_iocs(domain, ns + mx)[1:])
+        
+        async def ssl_threat(cert: SSLCertInfo | None) -> list[ThreatIntelResult]:
+            if cert is None or not cert.ip:
+                return []
+            return await self._cached("threat", cert.ip, lambda: threat_service.lookup(cert.ip))
+        
+        graph = TaskGraph()
+        graph.add("email_verification", verify)
+        graph.add("email_geo", email_geo, needs=("email_verification",))
+        graph.add("ns_hosts", ns_hosts, needs=("email_verification",))
+        graph.add("ns_records", ns_records, needs=("ns_hosts",))
+        graph.add("mx_records", mx_records, needs=("email_verification",))
+        graph.add("mx_counts", mx_counts, needs=("email_verification",))
+        graph.add("reputation", lambda _: self._sync(client, "domain", sync.get_domain_reputation, domain), needs=("email_verification",))
+        graph.add("whois", lambda _: self._sync(client, "domain", sync.get_whois, domain), needs=("email_verification",))
+        graph.add("whois_history", lambda _: self._sync(client, "domain", sync.get_whois_history_count, domain), needs=("email_verification",))
+        graph.add("threat_domain", threat_domain, needs=("email_verification",))
+        graph.add("threat_dns", threat_dns, needs=("ns_records", "mx_records"))
+        graph.add("ssl", lambda _: self._cached("ssl", domain, lambda: ssl_service.get_cert_info(domain)), needs=("email_verification",))
+        graph.add("ssl_threat", ssl_threat, needs=("ssl",))
+        
+        # The checks overlap, so their output is printed by topic once all are done
+        self._log(f"\nRunning {len(graph)} checks...")
+        results, errors, report.stage_timings = await graph.run()
+        
+        # Email verification
+        self._log("\nEmail verification:")
+        if report.email_verification:
+            self._print_email_verification(report.email_verification)
+        if isinstance(errors.get("email_verification"), ValidationError):
+            reason = str(errors["email_verification"])
+            report.errors.append(f"Email validation failed: {reason}")
+            self._log(f"      ❌ {reason}")
+            return
+        for error in report.errors:
+            self._log(f"      ❌ {error}")
+        if report.email_verification:
+            self._log("      ✓ Email verification passed")
+        
+        report.email_geo = results.get("email_geo")
+        if report.email_geo:
+            self._add_country(report, report.email_geo.country)
+            self._log(f"      Location: {report.email_geo.city}, {report.email_geo.region}, {report.email_geo.country}")
+        
+        # DNS record collection (NS and MX)
+        self._log("\nDNS records:")
+        mx_hostnames = report.email_verification.mx_records if report.email_verification else []
+        self._log(f"      Found {len(results.get('ns_hosts', []))} NS records, {len(mx_hostnames)} MX records")
+        
+        report.ns_records = results.get("ns_records", [])
+        report.mx_records = results.get("mx_records", [])
+        self._print_dns_records(report, report.ns_records, "NS")
+        self._print_dns_records(report, report.mx_records, "MX")
+        
+        report.mx_domain_counts = results.get("mx_counts", {})
+        
+        if not mx_hostnames:
+            report.errors.append("No MX records found - invalid email configuration")
+            self._log("      ❌ No MX records found")
+        
+        # Domain reputation and WHOIS
+        self._log("\nDomain reputation and WHOIS:")
+        
+        report.domain_reputation_score = results.get("reputation")
+        if report.domain_reputation_score is not None:
+            status = "✓" if report.domain_reputation_score > Config.REPUTATION_SCORE_THRESHOLD else "⚠"
+            self._log(f"      {status} Reputation score: {report.domain_reputation_score}")
+        
+        whois_data = results.get("whois") or {}
+        report.domain_age_days = whois_data.get("age_days")
+        report.whois_registrant = whois_data.get("registrant")
+        report.whois_registrar = whois_data.get("registrar")
+        report.whois_contact_email = whois_data.get("contact_email")
+        
+        if report.domain_age_days is not None:
+            if report.domain_age_days < Config.NEW_DOMAIN_DAYS_THRESHOLD:
+                self._log(f"      ⚠ Domain is only {report.domain_age_days} days old")
             else:
-                print("      ⚠ Could not retrieve SSL certificate")
+                self._log(f"      ✓ Domain is {report.domain_age_days} days old")
+        
+        report.whois_history_count = results.get("whois_history")
+        if report.whois_history_count:
+            self._log(f"      Historical WHOIS records: {report.whois_history_count}")
+        
+        # Threat intelligence
+        self._log("\nThreat intelligence:")
+        
+        report.threat_intel = {**results.get("threat_domain", {}), **results.get("threat_dns", {})}
+        threats_found = sum(len(v) for v in report.threat_intel.values())
+        if threats_found:
+            self._log(f"      ⚠ Found {threats_found} threat intelligence records")
+        else:
+            self._log("      ✓ No threat intelligence records found")
+        
+        # SSL certificate
+        self._log("\nSSL certificate:")
+        
+        report.ssl_cert = results.get("ssl")
+        if report.ssl_cert:
+            self._add_country(report, report.ssl_cert.issuer_country)
+            self._log(f"      ✓ Valid from {report.ssl_cert.valid_from} to {report.ssl_cert.valid_to}")
+            self._log(f"      Issuer: {report.ssl_cert.organization} ({report.ssl_cert.issuer_country})")
             
-            # Step 6: Summary
-            print("\n[6/6] Generating summary...")
-            report.countries_seen = sorted(set(self.countries_seen))
-            print(f"      Countries observed: {', '.join(report.countries_seen) or 'None'}")
+            # Additional threat intel for SSL
+            if results.get("ssl_threat"):
+                report.threat_intel[f"ssl_ip:{report.ssl_cert.ip}"] = results["ssl_threat"]
+        else:
+            self._log("      ⚠ Could not retrieve SSL certificate")
         
-        report.elapsed_time = time.perf_counter() - start_time
-        return report
+        # Summary
+        self._log("\nSummary:")
+        report.countries_seen = sorted(set(report.countries_seen))
+        self._log(f"      Countries observed: {', '.join(report.countries_seen) or 'None'}")
+        
+        for timing in report.stage_timings:
+            if timing.status == "error":
+                report.errors.append(f"{timing.name} failed: {errors[timing.name]}")
     
-    def _resolve_dns_records(self, hostnames: list[str], record_type: str) -> list[DNSRecordInfo]:
+    async def _resolve_dns_records(self, client: AsyncAPIClient, hostnames: list[str]) -> list[DNSRecordInfo]:
         """Resolve hostnames to IPs and collect geo/netblock data."""
-        records = []
+        sync = self.sync_services
+        backends = self.backends
         
-        for hostname in hostnames:
-            ips = self.sync_services.get_a_records(hostname)
-            
-            for ip in ips:
-                geo = self.sync_services.get_geo_by_ip(ip)
-                netblock = self.sync_services.get_netblock(ip)
-                
-                if geo:
-                    self._add_country(geo.country)
-                
-                records.append(DNSRecordInfo(
-                    hostname=hostname,
-                    ip_address=ip,
-                    geo=geo,
-                    netblock=netblock,
-                ))
-                
-                print(f"      {record_type}: {hostname} -> {ip}")
-                print(f"           Location: {geo.city}, {geo.region}, {geo.country}")
-                print(f"           ASN: {netblock.asn} ({netblock.name})")
+        # All A lookups at once, then geo and netblock for every IP at once
+        ips_by_host = await asyncio.gather(*(
+            self._sync(client, "dns", sync.get_a_records, hostname) for hostname in hostnames
+        ))
+        pairs = [(hostname, ip) for hostname, ips in zip(hostnames, ips_by_host) for ip in ips]
+        lookups = await asyncio.gather(*(
+            asyncio.gather(
+                self._ip_lookup(client, backends.geo, ip),
+                self._ip_lookup(client, backends.netblocks, ip),
+            )
+            for _, ip in pairs
+        ))
         
-        return records
+        return [
+            DNSRecordInfo(hostname=hostname, ip_address=ip, geo=geo, netblock=netblock)
+            for (hostname, ip), (geo, netblock) in zip(pairs, lookups)
+        ]
+    
+    def _print_dns_records(self, report: KYCReport, records: list[DNSRecordInfo], record_type: str) -> None:
+        """Print resolved records and track their countries."""
+        for record in records:
+            geo, netblock = record.geo, record.netblock
+            if geo:
+                self._add_country(report, geo.country)
+            
+            self._log(f"      {record_type}: {record.hostname} -> {record.ip_address}")
+            self._log(f"           Location: {geo.city}, {geo.region}, {geo.country}")
+            self._log(f"           ASN: {netblock.asn} ({netblock.name})")
     
-    def _collect_iocs(self, domain: str, report: KYCReport) -> list[str]:
+    def _collect_iocs(self, domain: str, records: list[DNSRecordInfo]) -> list[str]:
         """Collect all IOCs for threat intelligence lookup."""
         iocs = [domain]
         
-        for record in report.ns_records + report.mx_records:
+        for record in records:
             if record.hostname not in iocs:
                 iocs.append(record.hostname)
             if record.ip_address not in iocs:
@@ -735,7 +1721,7 @@ class KYCProcessor:
             # For free/disposable, we want FAILED to be good
             if name in ("Free email", "Disposable"):
                 symbol = "✓" if status == CheckStatus.FAILED else "✗" if status == CheckStatus.PASSED else "?"
-            print(f"      {symbol} {name}: {status.value}")
+            self._log(f"      {symbol} {name}: {status.value}")
 
 
 # =============================================================================
@@ -795,8 +1781,9 @@ class ReportPrinter:
             print("\n--- MX Records ---")
             for record in report.mx_records:
                 print(f"  {record.hostname} -> {record.ip_address}")
-                if record.hostname in report.mx_domain_counts:
-                    print(f"    Domains on server: {report.mx_domain_counts[record.hostname]}")
+                count = report.mx_domain_counts.get(_host_key(record.hostname))
+                if count is not None:
+                    print(f"    Domains on server: {count}")
                 if record.geo:
                     print(f"    Location: {record.geo.country}")
                 if record.netblock:
@@ -831,6 +1818,33 @@ class ReportPrinter:
             counter = Counter(report.countries_seen)
             print(f"  {', '.join(f'{c}({n})' for c, n in counter.most_common())}")
         
+        # Stage timings
+        if report.stage_timings:
+            print("\n--- Stage Timings ---")
+            for t in report.stage_timings:
+                status = "" if t.status == "ok" else f" ({t.status})"
+                print(f"  {t.name:<20} +{t.start * 1000:7.0f} ms  {t.duration * 1000:7.0f} ms{status}")
+        
+        # Upstream calls, slowest endpoint first
+        calls: dict[str, list[float]] = {}
+        for span in report.spans:
+            if span.name != "cache":
+                calls.setdefault(span.endpoint, []).append(span.duration)
+        if calls:
+            print("\n--- Upstream Calls ---")
+            for endpoint, durations in sorted(calls.items(), key=lambda c: -max(c[1])):
+                print(f"  {endpoint:<45} {len(durations):3d} calls  max {max(durations) * 1000:6.0f} ms  "
+                      f"total {sum(durations) * 1000:6.0f} ms")
+        
+        # API requests
+        m = report.api_metrics
+        if m.retries or m.hedged or m.short_circuited or m.degraded:
+            print("\n--- API Requests ---")
+            print(f"  Requests: {m.requests}, retries: {m.retries}, hedged: {m.hedged}, "
+                  f"short-circuited: {m.short_circuited}")
+            for check in m.degraded:
+                print(f"  ⚠ Degraded: {check}")
+        
         # Errors
         if report.errors:
             print("\n--- Errors ---")
@@ -840,11 +1854,347 @@ class ReportPrinter:
         print("\n" + "=" * 70)
 
 
+# =============================================================================
+# Tracing and Profiling
+# =============================================================================
+
+class SpanExporter:
+    """
+    Writes the spans of finished reports to a file (--trace).
+    
+    Formats:
+        jsonl  one JSON line per span, with the report's email
+        otel   one OTLP/JSON ExportTraceServiceRequest line per report (as the
+               OpenTelemetry collector's file exporter writes them): a root
+               span for the run with every traced call as its child
+    """
+    
+    def __init__(self, path: str, fmt: str = "jsonl"):
+        self.format = fmt
+        self._out = open(path, "w", encoding="utf-8")
+    
+    def export(self, report: KYCReport) -> None:
+        if not report.spans:
+            return
+        if self.format == "otel":
+            self._out.write(json.dumps(self._otlp(report)) + "\n")
+        else:
+            for span in report.spans:
+                self._out.write(json.dumps({"email": report.email, **_json_default(span)}) + "\n")
+        self._out.flush()
+    
+    @staticmethod
+    def _otlp(report: KYCReport) -> dict[str, Any]:
+        trace_id = os.urandom(16).hex()
+        root_id = os.urandom(8).hex()
+        
+        def nanos(offset: float) -> str:
+            return str(int((report.started_at + offset) * 1e9))
+        
+        def attributes(**values: Any) -> list[dict[str, Any]]:
+            return [
+                {"key": key, "value": {"intValue": str(value)} if isinstance(value, int) else {"stringValue": value}}
+                for key, value in values.items() if value not in ("", None)
+            ]
+        
+        spans = [{
+            "traceId": trace_id, "spanId": root_id, "name": "kyc.process_email", "kind": 1,
+            "startTimeUnixNano": nanos(0.0), "endTimeUnixNano": nanos(report.elapsed_time),
+            "attributes": attributes(**{"kyc.email": report.email, "kyc.domain": report.domain,
+                                        "kyc.errors": len(report.errors)}),
+            "status": {"code": 2 if report.errors else 0},
+        }]
+        for span in report.spans:
+            failed = not (span.status == "ok" or (span.status.isdigit() and int(span.status) < 400))
+            spans.append({
+                "traceId": trace_id, "spanId": os.urandom(8).hex(), "parentSpanId": root_id,
+                "name": f"kyc.{span.name}", "kind": 3 if span.name in ("http", "sdk") else 1,
+                "startTimeUnixNano": nanos(span.start), "endTimeUnixNano": nanos(span.start + span.duration),
+                "attributes": attributes(**{
+                    "kyc.endpoint": span.endpoint,
+                    "http.response.status_code": int(span.status) if span.status.isdigit() else None,
+                    "kyc.status": span.status, "kyc.bytes": span.bytes or None, "kyc.cache": span.cache,
+                }),
+                "status": {"code": 2 if failed else 0},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": attributes(**{"service.name": "kyc"})},
+            "scopeSpans": [{"scope": {"name": "kyc"}, "spans": spans}],
+        }]}
+    
+    def close(self) -> None:
+        self._out.close()
+
+
+def profile_run(func: Callable[[], T], path: str, profiler: str = "cprofile") -> T:
+    """
+    Run func() under a profiler and save the result to path (--profile).
+    
+    cprofile writes pstats data (python -m pstats FILE); pyinstrument, if
+    installed, writes an HTML report for *.html paths and text otherwise.
+    Both profile the event loop thread, not the SDK worker threads.
+    """
+    if profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise SystemExit("--profiler pyinstrument needs the pyinstrument package (pip install pyinstrument)")
+        prof = Profiler(async_mode="enabled")
+        prof.start()
+        try:
+            return func()
+        finally:
+            prof.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(prof.output_html() if path.endswith(".html") else prof.output_text())
+            print(f"Profile written to {path}", file=sys.stderr)
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func)
+    finally:
+        prof.dump_stats(path)
+        print(f"Profile written to {path} (view with: python -m pstats {path})", file=sys.stderr)
+
+
+# =============================================================================
+# Bulk Processing
+# =============================================================================
+
+def report_to_dict(report: KYCReport) -> dict[str, Any]:
+    """KYCReport as plain JSON-compatible data."""
+    data = asdict(report)
+    if report.email_verification:
+        for name, value in data["email_verification"].items():
+            if isinstance(value, CheckStatus):
+                data["email_verification"][name] = value.value
+    return data
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if hasattr(value, "__dataclass_fields__"):
+        return {name: getattr(value, name) for name in value.__dataclass_fields__}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def to_json_bytes(value: Any) -> bytes:
+    """
+    Compact UTF-8 JSON of a KYCReport (or any result model), shaped like
+    report_to_dict() but without first copying the report into dicts.
+    Uses orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def use_sdk_thread_pool(max_workers: int) -> None:
+    """SDK calls run in the loop's default executor; give it as many threads as the request limit allows."""
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+
+
+def read_emails(path: str) -> list[str]:
+    """Email addresses from a file, one per line; blank lines and # comments are skipped."""
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+async def process_batch(emails: list[str], output: str = "-", concurrency: int | None = None,
+                        backends: LookupBackends | None = None,
+                        exporter: SpanExporter | None = None) -> dict[str, int]:
+    """
+    Run KYC for many emails on one pooled client and a shared TTLCache.
+    
+    `concurrency` emails are processed at a time; reports are written as
+    JSON lines (to stdout for "-") as soon as each one finishes, so the
+    order follows completion, not the input.
+    
+    Returns:
+        Counts of processed emails, emails with errors, cache hits/misses and
+        lookups answered from local feeds (local) or the API (api)
+    """
+    concurrency = concurrency or Config.BATCH_CONCURRENCY
+    cache = TTLCache()
+    processor = KYCProcessor(Config.API_KEY, cache=cache, verbose=False, backends=backends)
+    stats = Counter()
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for email in emails:
+        queue.put_nowait(email)
+    
+    use_sdk_thread_pool(Config.BATCH_MAX_CONCURRENT_REQUESTS)
+    
+    out = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        async with AsyncAPIClient(
+            Config.API_KEY,
+            max_concurrent=Config.BATCH_MAX_CONCURRENT_REQUESTS,
+            timeout=Config.REQUEST_TIMEOUT
+        ) as client:
+            
+            async def worker() -> None:
+                while not queue.empty():
+                    email = queue.get_nowait()
+                    if '@' not in email:
+                        report = KYCReport(email=email, domain="", errors=["Invalid email address"])
+                    else:
+                        try:
+                            report = await processor.process_email(email, client)
+                        except Exception as e:
+                            report = KYCReport(email=email, domain=email.split('@')[1], errors=[f"KYC failed: {e}"])
+                    out.write(to_json_bytes(report) + b"\n")
+                    out.flush()
+                    if exporter is not None:
+                        exporter.export(report)
+                    stats["processed"] += 1
+                    if report.errors:
+                        stats["with_errors"] += 1
+            
+            await asyncio.gather(*(worker() for _ in range(min(concurrency, len(emails)) or 1)))
+        stats.update(client.stats)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    
+    stats.update(cache.stats)
+    stats.update(processor.backends.stats())
+    return dict(stats)
+
+
+# =============================================================================
+# Service Mode
+# =============================================================================
+
+class KYCService:
+    """
+    Long-lived HTTP front end for KYCProcessor (--serve).
+    
+    Endpoints:
+        GET /kyc?email=...  KYC report as JSON (400 for an invalid address,
+                            500 with the error in the report if the run failed)
+        GET /health         counters of the service, cache, client and feeds
+    
+    The API client, its connection pool, the SDK clients, the TTLCache and
+    the local feeds are created once and stay warm between requests.
+    Concurrent requests for the same email share one run; lookups shared by
+    different emails (same domain, MX host or IP) are coalesced by the cache.
+    """
+    
+    def __init__(self, api_key: str, backends: LookupBackends | None = None,
+                 exporter: SpanExporter | None = None):
+        self.api_key = api_key
+        self.exporter = exporter
+        self.cache = TTLCache()
+        self.processor = KYCProcessor(api_key, cache=self.cache, verbose=False, backends=backends)
+        self.client: AsyncAPIClient | None = None
+        self.stats = Counter()
+        self._inflight: dict[str, asyncio.Future[KYCReport]] = {}
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.cleanup_ctx.append(self._client_context)
+        app.router.add_get("/kyc", self.handle_kyc)
+        app.router.add_get("/health", self.handle_health)
+        return app
+    
+    async def _client_context(self, app: web.Application):
+        """Open the shared client (and SDK thread pool) for the lifetime of the app."""
+        use_sdk_thread_pool(Config.BATCH_MAX_CONCURRENT_REQUESTS)
+        async with AsyncAPIClient(
+            self.api_key,
+            max_concurrent=Config.BATCH_MAX_CONCURRENT_REQUESTS,
+            timeout=Config.REQUEST_TIMEOUT,
+            keepalive=Config.SERVICE_KEEPALIVE
+        ) as self.client:
+            yield
+    
+    async def report(self, email: str) -> KYCReport:
+        """KYC report for an email; joins a run already in progress for the same address."""
+        future = self._inflight.get(email)
+        if future is None:
+            future = asyncio.ensure_future(self.processor.process_email(email, self.client))
+            future.add_done_callback(self._export)
+            self._inflight[email] = future
+            future.add_done_callback(lambda _: self._inflight.pop(email, None))
+        else:
+            self.stats["coalesced"] += 1
+        # shield: a client hanging up does not cancel the run for the others
+        return await asyncio.shield(future)
+    
+    def _export(self, future: asyncio.Future[KYCReport]) -> None:
+        """Hand a finished run's spans to the exporter (once, however many requests shared it)."""
+        if self.exporter is not None and not future.cancelled() and future.exception() is None:
+            self.exporter.export(future.result())
+    
+    async def handle_kyc(self, request: web.Request) -> web.Response:
+        email = request.query.get("email", "").strip()
+        if '@' not in email:
+            return web.json_response({"error": "Invalid email address"}, status=400)
+        self.stats["requests"] += 1
+        try:
+            report = await self.report(email)
+        except Exception as e:
+            self.stats["failed"] += 1
+            report = KYCReport(email=email, domain=email.split('@')[1], errors=[f"KYC failed: {e}"])
+            return web.Response(body=to_json_bytes(report), status=500, content_type="application/json")
+        if report.errors:
+            self.stats["with_errors"] += 1
+        return web.Response(body=to_json_bytes(report), content_type="application/json")
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "in_flight": len(self._inflight),
+            "service": dict(self.stats),
+            "cache": dict(self.cache.stats),
+            "api": dict(self.client.stats) if self.client else {},
+            "feeds": dict(self.processor.backends.stats()),
+        })
+
+
+async def serve(address: str, backends: LookupBackends | None = None,
+                exporter: SpanExporter | None = None) -> None:
+    """Run KYCService on [HOST:]PORT until interrupted."""
+    host, _, port = address.rpartition(":")
+    runner = web.AppRunner(KYCService(Config.API_KEY, backends, exporter).app())
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host or "127.0.0.1", int(port)).start()
+        print(f"KYC service listening on http://{host or '127.0.0.1'}:{port}/kyc?email=...", file=sys.stderr)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 # =============================================================================
 # Main Entry Point
 # =============================================================================
 
-async def main(email: str | None = None) -> int:
+def create_backends() -> LookupBackends:
+    """LookupBackends with the local feeds named in Config loaded."""
+    files = {
+        "geo": feed_paths(Config.GEO_CSV),
+        "netblock": feed_paths(Config.NETBLOCKS_CSV),
+        "threat": feed_paths(Config.THREAT_FEEDS),
+    }
+    start = time.perf_counter()
+    backends = LookupBackends.create(Config.API_KEY, files["geo"], files["netblock"], files["threat"])
+    loaded = {
+        "geo": backends.geo.index,
+        "netblock": backends.netblocks.index,
+        "threat": backends.threat_feed,
+    }
+    summary = [f"{len(index)} {name} entries" for name, index in loaded.items() if index is not None]
+    if summary:
+        print(f"Loaded {', '.join(summary)} from local feeds in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+    return backends
+
+
+async def main(email: str | None = None, batch: str | None = None,
+               output: str = "-", concurrency: int | None = None, listen: str | None = None,
+               trace: str | None = None, trace_format: str = "jsonl") -> int:
     """Main entry point for KYC verification."""
     
     # Validate configuration
@@ -856,6 +2206,36 @@ async def main(email: str | None = None) -> int:
         print("  export WHOISXML_API_KEY='your-api-key-here'")
         return 1
     
+    backends = create_backends()
+    exporter = SpanExporter(trace, trace_format) if trace else None
+    Config.TRACE = exporter is not None or not (listen or batch)
+    try:
+        return await _run_mode(backends, exporter, email, batch, output, concurrency, listen)
+    finally:
+        if exporter is not None:
+            exporter.close()
+
+
+async def _run_mode(backends: LookupBackends, exporter: SpanExporter | None, email: str | None,
+                    batch: str | None, output: str, concurrency: int | None, listen: str | None) -> int:
+    """Service, bulk or single-email mode of main()."""
+    if listen:
+        await serve(listen, backends, exporter)
+        return 0
+    
+    if batch:
+        emails = read_emails(batch)
+        print(f"Processing {len(emails)} emails from {batch}", file=sys.stderr)
+        start = time.perf_counter()
+        stats = await process_batch(emails, output, concurrency, backends, exporter)
+        print(f"Done in {time.perf_counter() - start:.1f}s: {stats.get('processed', 0)} reports, "
+              f"{stats.get('with_errors', 0)} with errors; cache {stats.get('hits', 0)} hits, "
+              f"{stats.get('coalesced', 0)} shared, {stats.get('misses', 0)} misses; "
+              f"{stats.get('local', 0)} lookups from local feeds; {stats.get('requests', 0)} API requests, "
+              f"{stats.get('retries', 0)} retries, {stats.get('hedged', 0)} hedged, "
+              f"{stats.get('short_circuited', 0)} short-circuited", file=sys.stderr)
+        return 0
+    
     # Get email address
     if not email:
         email = input("\nEnter email address: ").strip()
@@ -868,8 +2248,10 @@ async def main(email: str | None = None) -> int:
     print("-" * 50)
     
     # Process
-    processor = KYCProcessor(Config.API_KEY)
+    processor = KYCProcessor(Config.API_KEY, backends=backends)
     report = await processor.process_email(email)
+    if exporter is not None:
+        exporter.export(report)
     
     # Print report
     ReportPrinter.print_full_report(report)
@@ -879,8 +2261,50 @@ async def main(email: str | None = None) -> int:
 
 def run():
     """Synchronous wrapper for main()."""
-    email = sys.argv[1] if len(sys.argv) > 1 else None
-    return asyncio.run(main(email))
+    parser = argparse.ArgumentParser(description="KYC email verification using WHOISXMLAPI services")
+    parser.add_argument("email", nargs="?", help="Email address to verify (prompted for if omitted)")
+    parser.add_argument("--batch", metavar="FILE", help="Verify every email in FILE (one per line), writing JSONL reports; "
+                             "lookups shared between emails are cached (Config.CACHE_TTLS)")
+    parser.add_argument("--output", default="-", help="JSONL output file for --batch (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help=f"Emails processed at once with --batch (default: {Config.BATCH_CONCURRENCY})")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="Run as an HTTP service (GET /kyc?email=...) instead of checking one email; "
+                             "lookups are cached between requests (Config.CACHE_TTLS)")
+    parser.add_argument("--hedge-after", type=float, metavar="SECONDS", default=Config.HEDGE_AFTER,
+                        help="Send a second copy of threat/geo/SSL lookups still unanswered after SECONDS "
+                             "(default: off)")
+    diagnostics = parser.add_argument_group("tracing and profiling")
+    diagnostics.add_argument("--trace", metavar="FILE",
+                             help="Write a span for every API/SDK call and cache lookup of every report to FILE")
+    diagnostics.add_argument("--trace-format", choices=["jsonl", "otel"], default="jsonl",
+                             help="jsonl: one line per span; otel: one OTLP/JSON trace per report (default: jsonl)")
+    diagnostics.add_argument("--profile", metavar="FILE", help="Profile the whole run and save the result to FILE")
+    diagnostics.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+                             help="Profiler for --profile (default: cprofile)")
+    feeds = parser.add_argument_group("local data feeds", "Answer lookups from downloaded feed files "
+                                      "(.csv or .csv.gz) instead of the API; options can be repeated")
+    feeds.add_argument("--netblocks-csv", metavar="FILE", action="append",
+                       help="IP netblocks feed (default: $KYC_NETBLOCKS_CSV)")
+    feeds.add_argument("--geo-csv", metavar="FILE", action="append",
+                       help="IP geolocation feed, IPv4 and/or IPv6 (default: $KYC_GEO_CSV)")
+    feeds.add_argument("--threat-feed", metavar="FILE", action="append",
+                       help="Threat Intelligence malicious-ips/-domains/-cidrs csv (default: $KYC_THREAT_FEEDS)")
+    args = parser.parse_args()
+    Config.HEDGE_AFTER = args.hedge_after
+    for setting, files in (("NETBLOCKS_CSV", args.netblocks_csv), ("GEO_CSV", args.geo_csv),
+                           ("THREAT_FEEDS", args.threat_feed)):
+        if files:
+            setattr(Config, setting, os.pathsep.join(files))
+    
+    def run_main() -> int:
+        return asyncio.run(main(args.email, args.batch, args.output, args.concurrency, args.serve,
+                                args.trace, args.trace_format))
+    
+    try:
+        return profile_run(run_main, args.profile, args.profiler) if args.profile else run_main()
+    except KeyboardInterrupt:
+        return 0
 
 
 if __name__ == "__main__":
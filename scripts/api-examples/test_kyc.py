@@ -0,0 +1,311 @@
+"""
+Tests for kyc.py's concurrency plumbing. Needs the packages in kyc-requirements.txt.
+  $ python -m pytest scripts/api-examples/test_kyc.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import kyc  # noqa: E402
+
+# Well-formed for the SDK clients' key check; never sent anywhere
+API_KEY = "at_" + "0" * 29
+
+
+class _Lookup:
+    """compute() for TTLCache.get that takes a moment and counts its calls."""
+
+    def __init__(self, value, seconds=0.05):
+        self.value = value
+        self.seconds = seconds
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if isinstance(self.value, BaseException):
+            raise self.value
+        return self.value
+
+
+# ── TTLCache ──────────────────────────────────────────────────────────────────
+
+def test_cache_coalesces_concurrent_lookups():
+    async def run():
+        cache = kyc.TTLCache(ttls={"dns": 60})
+        lookup = _Lookup(["ns1.example.com"])
+        results = await asyncio.gather(*(cache.get("dns", "example.com", lookup) for _ in range(10)))
+        assert results == [["ns1.example.com"]] * 10
+        assert await cache.get("dns", "example.com", lookup) == ["ns1.example.com"]
+        assert lookup.calls == 1
+        assert cache.stats == {"misses": 1, "coalesced": 9, "hits": 1}
+
+    asyncio.run(run())
+
+
+def test_cache_keeps_empty_results_for_the_empty_ttl():
+    async def run():
+        cache = kyc.TTLCache(ttls={"ip": 60, "dns": 60}, empty_ttl=0.05)
+        empty_geo = _Lookup(kyc.GeoLocation(), seconds=0)
+        no_records = _Lookup([], seconds=0)
+        found = _Lookup(["ns1.example.com"], seconds=0)
+        await cache.get("ip", "192.0.2.1", empty_geo)
+        await cache.get("dns", "empty.example", no_records)
+        await cache.get("dns", "example.com", found)
+        await asyncio.sleep(0.1)
+        await cache.get("ip", "192.0.2.1", empty_geo)
+        await cache.get("dns", "empty.example", no_records)
+        await cache.get("dns", "example.com", found)
+        assert (empty_geo.calls, no_records.calls, found.calls) == (2, 2, 1)
+
+    asyncio.run(run())
+
+
+def test_cache_shares_failures_but_does_not_keep_them():
+    async def run():
+        cache = kyc.TTLCache(ttls={"domain": 60})
+        failing = _Lookup(kyc.APIError("upstream down", 500))
+        results = await asyncio.gather(*(cache.get("domain", "example.com", failing) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, kyc.APIError) for r in results)
+        assert failing.calls == 1
+        ok = _Lookup({"score": 90}, seconds=0)
+        assert await cache.get("domain", "example.com", ok) == {"score": 90}
+
+    asyncio.run(run())
+
+
+def test_cache_skips_kinds_without_ttl_and_evicts_when_full():
+    async def run():
+        cache = kyc.TTLCache(ttls={"dns": 60}, max_entries=2)
+        uncached = _Lookup("x", seconds=0)
+        await cache.get("verification", "a@example.com", uncached)
+        await cache.get("verification", "a@example.com", uncached)
+        assert uncached.calls == 2
+        for host in ("a.example", "b.example", "c.example"):
+            await cache.get("dns", host, _Lookup([host], seconds=0))
+        assert len(cache._entries) == 2 and ("dns", "a.example") not in cache._entries
+
+    asyncio.run(run())
+
+
+# ── Blocking SDK calls ────────────────────────────────────────────────────────
+
+def test_run_sync_overlaps_blocking_calls_up_to_the_request_limit():
+    async def run(max_concurrent):
+        client = kyc.AsyncAPIClient("key", max_concurrent=max_concurrent)
+        start = time.perf_counter()
+        await asyncio.gather(*(client.run_sync(time.sleep, 0.1) for _ in range(4)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(run(4)) < 0.18
+    assert asyncio.run(run(2)) >= 0.2
+
+
+def test_run_sync_keeps_the_event_loop_free():
+    async def run():
+        client = kyc.AsyncAPIClient("key")
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await client.run_sync(time.sleep, 0.1)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 5
+
+
+# ── Retries, hedging and the circuit breaker ─────────────────────────────────
+
+@pytest.fixture(autouse=True)
+def _fast_backoff(monkeypatch):
+    monkeypatch.setattr(kyc.Config, "RETRY_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(kyc.Config, "BREAKER_FAILURES", 3)
+
+
+@asynccontextmanager
+async def _api(handler, **client_options):
+    """(client, url, hits per ?k=) for an API served by handler(request, hit number)."""
+    hits = Counter()
+
+    async def handle(request):
+        key = request.query.get("k", "")
+        hits[key] += 1
+        return await handler(request, hits[key])
+
+    app = web.Application()
+    app.router.add_get("/api", handle)
+    async with TestServer(app) as server:
+        async with kyc.AsyncAPIClient("key", **client_options) as client:
+            yield client, str(server.make_url("/api")), hits
+
+
+def test_breaker_opens_after_threshold_and_lets_one_trial_through(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(kyc.time, "monotonic", lambda: clock[0])
+    breaker = kyc.CircuitBreaker(threshold=3, cooldown=30.0)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False)
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow() and not breaker.allow()  # one trial at a time
+    breaker.record(False)  # failed trial: open for another cooldown
+    assert not breaker.allow()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()  # cancelled trial: the next caller may try
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.allow() and breaker.allow() and breaker.failures == 0
+
+
+def test_get_json_retries_transient_errors():
+    async def handler(request, n):
+        if n == 1:
+            return web.Response(status=503, text="busy")
+        if n == 2:
+            return web.Response(status=429, text="slow down", headers={"Retry-After": "0.05"})
+        return web.json_response({"ok": True})
+
+    async def run():
+        async with _api(handler) as (client, url, hits):
+            assert await client.get_json(url, {"k": "a"}) == {"ok": True}
+            assert hits["a"] == 3 and client.stats["retries"] == 2
+
+    asyncio.run(run())
+
+
+def test_get_json_does_not_retry_client_errors_or_count_them_against_the_host():
+    async def handler(request, n):
+        return web.Response(status=400, text="bad domain")
+
+    async def run():
+        async with _api(handler) as (client, url, hits):
+            for _ in range(5):
+                with pytest.raises(kyc.APIError) as e:
+                    await client.get_json(url, {"k": "a"})
+                assert not isinstance(e.value, kyc.CircuitOpenError) and e.value.status_code == 400
+            assert hits["a"] == 5
+
+    asyncio.run(run())
+
+
+def test_open_circuit_fails_fast_without_a_request():
+    async def handler(request, n):
+        return web.Response(status=500, text="down")
+
+    async def run():
+        async with _api(handler, max_retries=0) as (client, url, hits):
+            for _ in range(3):
+                with pytest.raises(kyc.TransientAPIError):
+                    await client.get_json(url, {"k": "a"})
+            with pytest.raises(kyc.CircuitOpenError):
+                await client.get_json(url, {"k": "b"})
+            assert hits["b"] == 0 and client.stats["short_circuited"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_trial_does_not_keep_the_circuit_open(monkeypatch):
+    monkeypatch.setattr(kyc.Config, "BREAKER_COOLDOWN", 0.0)
+
+    async def handler(request, n):
+        if request.query["k"] == "down":
+            return web.Response(status=500, text="down")
+        if request.query["k"] == "hang":
+            await asyncio.sleep(5)
+        return web.json_response({"ok": True})
+
+    async def run():
+        async with _api(handler, max_retries=0) as (client, url, hits):
+            for _ in range(3):
+                with pytest.raises(kyc.TransientAPIError):
+                    await client.get_json(url, {"k": "down"})
+            trial = asyncio.create_task(client.get_json(url, {"k": "hang"}))
+            await asyncio.sleep(0.1)
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            assert await client.get_json(url, {"k": "ok"}) == {"ok": True}
+
+    asyncio.run(run())
+
+
+def test_hedged_request_takes_the_first_answer():
+    async def handler(request, n):
+        if n == 1:
+            await asyncio.sleep(5)
+        return web.json_response({"copy": n})
+
+    async def run():
+        async with _api(handler, hedge_after=0.05) as (client, url, hits):
+            start = time.perf_counter()
+            assert await client.get_json(url, {"k": "a"}, hedge=True) == {"copy": 2}
+            assert time.perf_counter() - start < 1
+            assert client.stats["hedged"] == 1 and hits["a"] == 2
+
+    asyncio.run(run())
+
+
+# ── Service mode ──────────────────────────────────────────────────────────────
+
+@asynccontextmanager
+async def _service():
+    """(HTTP client, calls) for a KYCService whose runs take a moment and are recorded."""
+    service = kyc.KYCService(API_KEY)
+    calls = []
+
+    async def process_email(email, client):
+        calls.append(email)
+        await asyncio.sleep(0.05)
+        if email.startswith("boom@"):
+            raise RuntimeError("upstream exploded")
+        return kyc.KYCReport(email=email, domain=email.split("@")[1])
+
+    service.processor.process_email = process_email
+    async with TestClient(TestServer(service.app())) as http:
+        yield http, calls
+
+
+def test_service_coalesces_requests_for_the_same_email():
+    async def run():
+        async with _service() as (http, calls):
+            responses = await asyncio.gather(*(http.get("/kyc", params={"email": email})
+                                               for email in ("a@b.com", "a@b.com", "A@b.com")))
+            assert [(r.status, (await r.json())["email"]) for r in responses] == [
+                (200, "a@b.com"), (200, "a@b.com"), (200, "A@b.com")]
+            assert sorted(calls) == ["A@b.com", "a@b.com"]
+            health = await (await http.get("/health")).json()
+            assert health["service"] == {"requests": 3, "coalesced": 1} and health["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def test_service_reports_errors_as_json():
+    async def run():
+        async with _service() as (http, calls):
+            invalid = await http.get("/kyc", params={"email": "not-an-email"})
+            assert invalid.status == 400 and (await invalid.json()) == {"error": "Invalid email address"}
+            failed = await http.get("/kyc", params={"email": "boom@b.com"})
+            assert failed.status == 500 and failed.content_type == "application/json"
+            assert (await failed.json())["errors"] == ["KYC failed: upstream exploded"]
+            assert calls == ["boom@b.com"]
+
+    asyncio.run(run())
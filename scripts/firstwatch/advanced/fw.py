@@ -13,7 +13,10 @@ Environment (new):
 Output formats:
 - csv  : row-based, includes payload_json column
 - json : JSONL (newline-delimited JSON objects)
-- stix : STIX 2.1 Bundle JSON (single JSON file)
+  (csv/json are written in batches by a writer thread; .gz / .zst names or
+   --compress gzip|zstd compress them)
+- stix : STIX 2.1 Bundle JSON (single JSON file; --stix-stream writes it incrementally,
+         --stix-bundle-size N splits it into numbered bundles of about N objects)
 
 STIX behavior (from config):
 - TLP marking from [stix].tlp  (clear|green|amber|red)
@@ -25,31 +28,62 @@ Usage:
   python fw.py domains.csv results.csv
   python fw.py --fuzzy domains.csv results.jsonl
   python fw.py --output-format stix domains.csv firstwatch_bundle.json
+  python fw.py --output-format stix --stix-bundle-size 50000 domains.csv firstwatch_bundle.json
   python fw.py --fallback-fuzzy domains.csv results.csv
+  python fw.py --concurrency 8 --rate-limit 5 domains.csv results.csv
+  python fw.py --cache firstwatch_cache.db domains.csv results.csv
+  python fw.py --registrable-domain --bloom-capacity 50000000 urls.csv results.csv
+  python fw.py --resume domains.csv results.csv
+  python fw.py --concurrency 16 --progress bar --output-format json domains.csv results.jsonl.zst
+
+Every run keeps a checkpoint journal next to the output (<output>.journal);
+--resume skips the inputs it lists and appends to the existing output.
+
+Input values are normalized (lowercase, punycode, scheme/path stripped) and
+de-duplicated while the file is read, so inputs larger than memory can be used.
   python fw.py --create-config
 """
 
 from __future__ import annotations
 
 import argparse
+import base64
 import configparser
 import csv
+import gzip
+import hashlib
+import io
 import json
+import math
 import os
+import queue
+import random
+import sqlite3
 import sys
+import threading
 import time
 import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
 DEFAULT_BASE_URL = "https://chaos.yatic.io/api/firstwatch"
 DEFAULT_DELAY_SECONDS = 1.0
 DEFAULT_TIMEOUT_SECONDS = 30
 DEFAULT_MAX_RETRIES = 2  # retries for 429/5xx (not auth refresh)
+DEFAULT_CONCURRENCY = 1  # lookups in flight at once
+DEFAULT_CACHE_TTL_SECONDS = 6 * 3600
+DEFAULT_CACHE_NEGATIVE_TTL_SECONDS = 3600
+DEFAULT_CACHE_MEMORY_ENTRIES = 10000
+DEFAULT_TOKEN_REFRESH_MARGIN_SECONDS = 60  # log in again this long before the JWT expires
 
 # STIX vocab helpers (STIX 2.1 indicator_types open vocab; these are common/expected values)
 KNOWN_INDICATOR_TYPES = {
@@ -74,11 +108,21 @@ class FWConfig:
     delay: float = DEFAULT_DELAY_SECONDS
     timeout: int = DEFAULT_TIMEOUT_SECONDS
     max_retries: int = DEFAULT_MAX_RETRIES
+    concurrency: int = DEFAULT_CONCURRENCY
+    rate_limit: float = 0.0  # requests/second across all threads; 0 = derive from delay (concurrency 1 only)
+    burst: int = 1  # requests allowed back-to-back before rate_limit applies
 
     # Optional behavior
     check_quota_before_run: bool = True
     stop_if_quota_insufficient: bool = False
 
+    # Result cache (disabled when cache_path is empty)
+    cache_path: str = ""
+    cache_exact_ttl: float = DEFAULT_CACHE_TTL_SECONDS
+    cache_fuzzy_ttl: float = DEFAULT_CACHE_TTL_SECONDS
+    cache_negative_ttl: float = DEFAULT_CACHE_NEGATIVE_TTL_SECONDS
+    cache_memory_entries: int = DEFAULT_CACHE_MEMORY_ENTRIES
+
     # Output defaults (CLI can override)
     output_format: str = "csv"  # "csv" or "json"(JSONL) or "stix"(bundle)
 
@@ -88,6 +132,16 @@ class FWConfig:
     stix_identity_name: str = "FirstWatch"
     stix_labels: List[str] = None  # extra labels (optional)
 
+    @property
+    def requests_per_second(self) -> float:
+        if self.rate_limit > 0:
+            return self.rate_limit
+        # delay paces one lookup at a time; shared by N workers it would cancel
+        # out the concurrency, so they are only held back by the AIMD window
+        if self.concurrency > 1:
+            return 0.0
+        return 1.0 / self.delay if self.delay > 0 else 0.0
+
     @property
     def login_url(self) -> str:
         return f"{self.base_url}/login"
@@ -140,11 +194,30 @@ def load_config(config_file: str = "firstwatch.conf") -> FWConfig:
             cfg.timeout = int(api["timeout"].strip())
         if api.get("max_retries", "").strip():
             cfg.max_retries = int(api["max_retries"].strip())
+        if api.get("concurrency", "").strip():
+            cfg.concurrency = max(1, int(api["concurrency"].strip()))
+        if api.get("rate_limit", "").strip():
+            cfg.rate_limit = float(api["rate_limit"].strip())
+        if api.get("burst", "").strip():
+            cfg.burst = max(1, int(api["burst"].strip()))
         if api.get("check_quota_before_run", "").strip():
             cfg.check_quota_before_run = api.getboolean("check_quota_before_run")
         if api.get("stop_if_quota_insufficient", "").strip():
             cfg.stop_if_quota_insufficient = api.getboolean("stop_if_quota_insufficient")
 
+    if "cache" in cp:
+        cache = cp["cache"]
+        if cache.get("path", "").strip():
+            cfg.cache_path = cache["path"].strip()
+        if cache.get("exact_ttl", "").strip():
+            cfg.cache_exact_ttl = float(cache["exact_ttl"].strip())
+        if cache.get("fuzzy_ttl", "").strip():
+            cfg.cache_fuzzy_ttl = float(cache["fuzzy_ttl"].strip())
+        if cache.get("negative_ttl", "").strip():
+            cfg.cache_negative_ttl = float(cache["negative_ttl"].strip())
+        if cache.get("memory_entries", "").strip():
+            cfg.cache_memory_entries = int(cache["memory_entries"].strip())
+
     if "output" in cp:
         out = cp["output"]
         if out.get("output_format", "").strip():
@@ -183,39 +256,153 @@ def _looks_like_domain(s: str) -> bool:
     return "." in s and all(ch.isalnum() or ch in ".-_" for ch in s)
 
 
-def load_domains_from_csv(csv_file: str) -> List[str]:
-    if not os.path.exists(csv_file):
-        raise FileNotFoundError(f"Input file '{csv_file}' not found")
+def normalize_domain(value: str) -> str:
+    """
+    Reduce a URL / host / domain value to a lowercase ASCII (punycode) domain:
+    strips scheme, credentials, port, path, query and trailing dot.
+    Returns "" if nothing usable is left.
+    """
+    d = value.strip().lower()
+    if "://" in d:
+        d = d.split("://", 1)[1]
+    d = d.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+    d = d.rsplit("@", 1)[-1]
+    if d.count(":") == 1:
+        d = d.split(":", 1)[0]
+    d = d.strip().strip(".")
+    if not d:
+        return ""
+    if not d.isascii():
+        try:
+            d = d.encode("idna").decode("ascii")
+        except UnicodeError:
+            pass
+    return d
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter for de-duping inputs that may not fit in a set."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """Add item; return True if it was (probably) already present."""
+        present = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                present = False
+                self.bits[byte] |= 1 << bit
+        return present
+
 
-    domains: List[str] = []
-    with open(csv_file, "r", newline="", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        first = next(reader, None)
+def _registrable_domain_func() -> Callable[[str], str]:
+    try:
+        import tldextract
+    except ImportError:
+        raise RuntimeError("--registrable-domain needs the tldextract package (pip install tldextract)")
+
+    extract = tldextract.TLDExtract()
+
+    def registrable(domain: str) -> str:
+        ext = extract(domain)
+        value = getattr(ext, "top_domain_under_public_suffix", None) or ext.registered_domain
+        return value or domain
 
-        # Header detection: if first row doesn't look like a domain, skip it.
-        if first and first[0].strip():
-            if _looks_like_domain(first[0]):
-                domains.append(first[0].strip())
+    return registrable
 
-        for row in reader:
-            if not row:
+
+class DomainInput:
+    """
+    Lazily reads domains from the first column of a CSV file:
+    normalizes each value, optionally collapses it to its registrable domain
+    (public suffix list, needs tldextract), and drops duplicates.
+
+    De-dupe uses a set by default; with bloom_capacity > 0 a Bloom filter of
+    that capacity bounds memory instead (a false positive skips an input).
+    Iterating again re-reads the file; counters describe the last pass.
+    """
+
+    def __init__(
+        self,
+        csv_file: str,
+        *,
+        registrable: bool = False,
+        bloom_capacity: int = 0,
+        bloom_error_rate: float = 0.001,
+    ):
+        if not os.path.exists(csv_file):
+            raise FileNotFoundError(f"Input file '{csv_file}' not found")
+        self.csv_file = csv_file
+        self.registrable = _registrable_domain_func() if registrable else None
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.counters = {"rows": 0, "unique": 0, "duplicates": 0, "empty": 0}
+
+    def _values(self) -> Iterator[str]:
+        with open(self.csv_file, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            first = next(reader, None)
+
+            # Header detection: if first row doesn't look like a domain, skip it.
+            if first and first[0].strip():
+                if _looks_like_domain(normalize_domain(first[0])):
+                    yield first[0]
+
+            for row in reader:
+                if row:
+                    yield row[0]
+
+    def __iter__(self) -> Iterator[str]:
+        self.counters = {"rows": 0, "unique": 0, "duplicates": 0, "empty": 0}
+        if self.bloom_capacity > 0:
+            bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+            seen_before = bloom.add
+        else:
+            seen: set = set()
+
+            def seen_before(d: str) -> bool:
+                if d in seen:
+                    return True
+                seen.add(d)
+                return False
+
+        for value in self._values():
+            self.counters["rows"] += 1
+            d = normalize_domain(value)
+            if d and self.registrable:
+                d = self.registrable(d)
+            if not d:
+                self.counters["empty"] += 1
                 continue
-            val = row[0].strip()
-            if val:
-                domains.append(val)
-
-    # Normalize + de-dupe preserving order
-    out: List[str] = []
-    seen = set()
-    for d in domains:
-        d2 = d.strip().lower()
-        if not d2:
-            continue
-        if d2 in seen:
-            continue
-        seen.add(d2)
-        out.append(d2)
-    return out
+            if seen_before(d):
+                self.counters["duplicates"] += 1
+                continue
+            self.counters["unique"] += 1
+            yield d
+
+    def is_empty(self) -> bool:
+        """True if the file has no usable domain; stops reading at the first one."""
+        values = iter(self)
+        try:
+            return next(values, None) is None
+        finally:
+            values.close()
+
+
+def load_domains_from_csv(csv_file: str) -> List[str]:
+    return list(DomainInput(csv_file))
 
 
 # ----------------------------
@@ -233,21 +420,6 @@ OUTPUT_HEADER = [
 ]
 
 
-def write_results_header_csv(fh) -> None:
-    csv.writer(fh).writerow(OUTPUT_HEADER)
-    fh.flush()
-
-
-def write_result_csv(fh, row: List[Any]) -> None:
-    csv.writer(fh).writerow(row)
-    fh.flush()
-
-
-def write_result_jsonl(fh, obj: Dict[str, Any]) -> None:
-    fh.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    fh.flush()
-
-
 def build_record(
     *,
     input_query: str,
@@ -270,18 +442,13 @@ def build_record(
     }
 
 
-def write_record(fh, output_format: str, record: Dict[str, Any]) -> None:
-    if output_format == "json":
-        write_result_jsonl(fh, record)
-        return
-
-    # CSV
+def record_to_csv_row(record: Dict[str, Any]) -> List[Any]:
     payload = record.get("payload", None)
     payload_json = ""
     if payload is not None:
         payload_json = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
 
-    row = [
+    return [
         record.get("timestamp_utc", ""),
         record.get("input_query", ""),
         record.get("matched_domain", ""),
@@ -291,7 +458,148 @@ def write_record(fh, output_format: str, record: Dict[str, Any]) -> None:
         record.get("error", ""),
         payload_json,
     ]
-    write_result_csv(fh, row)
+
+
+def _compressor(compression: str) -> Callable[[bytes], bytes]:
+    if compression == "gzip":
+        return lambda data: gzip.compress(data, compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd output needs the zstandard package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=3).compress
+    return lambda data: data
+
+
+def output_compression(path: str, requested: Optional[str]) -> str:
+    """--compress value, or guessed from the output file name (.gz / .zst)."""
+    if requested:
+        return requested
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+class ResultWriter:
+    """
+    Batched csv / JSONL output.
+
+    Rows are encoded into an in-memory buffer with one reused csv writer and
+    written with a single write per batch (batch_records records, or whatever
+    is pending after flush_seconds). With gzip/zstd every batch is its own
+    gzip member / zstd frame: concatenated members are still one valid stream,
+    and a checkpoint taken after a batch is a place the file can be cut back to.
+
+    With queue_size > 0, add() only puts the result on a bounded queue and a
+    writer thread does the encoding and I/O, so it overlaps with the lookups.
+    Journal entries for a batch are recorded once the batch is in the file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        output_format: str,
+        *,
+        compression: str = "none",
+        append: bool = False,
+        batch_records: int = 500,
+        flush_seconds: float = 2.0,
+        queue_size: int = 1024,
+        journal: Optional[CheckpointJournal] = None,
+    ):
+        self.path = path
+        self.output_format = output_format
+        self.batch_records = max(1, batch_records)
+        self.flush_seconds = flush_seconds
+        self.journal = journal
+        self.records_written = 0
+        self._compress = _compressor(compression)
+        self._fh = open(path, "ab" if append else "wb")
+        self._buf = io.StringIO()
+        self._csv = csv.writer(self._buf)
+        self._pending_records = 0
+        self._pending_domains: List[str] = []
+        self._last_flush = time.monotonic()
+        if output_format == "csv" and not append:
+            self._csv.writerow(OUTPUT_HEADER)
+
+        self._error: Optional[BaseException] = None
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if queue_size > 0:
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._drain, name="fw-writer", daemon=True)
+            self._thread.start()
+
+    def add(self, domain: str, records: List[Dict[str, Any]]) -> None:
+        """Write one input's records (all of them land in the same batch)."""
+        if self._error:
+            raise RuntimeError(f"Output writer failed: {self._error}") from self._error
+        if self._queue is None:
+            self._add(domain, records)
+        else:
+            self._queue.put((domain, records))
+
+    def _add(self, domain: str, records: List[Dict[str, Any]]) -> None:
+        if self.output_format == "json":
+            self._buf.writelines(json.dumps(rec, ensure_ascii=False) + "\n" for rec in records)
+        else:
+            self._csv.writerows(record_to_csv_row(rec) for rec in records)
+        self._pending_records += len(records)
+        self._pending_domains.append(domain)
+        if self._pending_records >= self.batch_records or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+            except queue.Empty:
+                item = ()
+            try:
+                if item is None:
+                    self.flush()
+                    return
+                if item:
+                    self._add(*item)
+                elif self._pending_domains:
+                    self.flush()
+            except BaseException as e:
+                self._error = e
+                # Keep consuming so producers blocked on put() are released
+                while self._queue.get() is not None:
+                    pass
+                return
+
+    def flush(self) -> None:
+        data = self._buf.getvalue()
+        if data:
+            self._fh.write(self._compress(data.encode("utf-8")))
+            self._fh.flush()
+            self._buf.seek(0)
+            self._buf.truncate()
+        self.records_written += self._pending_records
+        if self.journal and self._pending_domains:
+            self.journal.record(self._pending_domains, self.path, self._fh.tell(), self._fh)
+        self._pending_records = 0
+        self._pending_domains = []
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Write what is pending, stop the writer thread and close the journal and file."""
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join()
+        else:
+            self.flush()
+        if self.journal:
+            self.journal.close(self._fh)
+        self._fh.close()
+        if self._error:
+            raise RuntimeError(f"Output writer failed: {self._error}") from self._error
 
 
 # ----------------------------
@@ -329,7 +637,9 @@ class StixBundleBuilder:
         self.identity_id = f"identity--{uuid.uuid4()}"
         self.marking_id = f"marking-definition--{uuid.uuid4()}"
 
-        self.objects.append({
+        # identity + marking: every bundle needs them for created_by_ref / object_marking_refs
+        self.preamble: List[Dict[str, Any]] = []
+        self.preamble.append({
             "type": "identity",
             "spec_version": "2.1",
             "id": self.identity_id,
@@ -340,7 +650,7 @@ class StixBundleBuilder:
         })
 
         # TLP marking definition
-        self.objects.append({
+        self.preamble.append({
             "type": "marking-definition",
             "spec_version": "2.1",
             "id": self.marking_id,
@@ -348,6 +658,7 @@ class StixBundleBuilder:
             "definition_type": "tlp",
             "definition": {"tlp": self.tlp},
         })
+        self.objects.extend(self.preamble)
 
         # Determine how to represent "classification"
         cls_lower = self.classification.lower()
@@ -370,17 +681,7 @@ class StixBundleBuilder:
         now = _utc_now_z()
 
         # Domain SCO (de-dupe)
-        domain_id = self.domain_id_by_value.get(domain_value)
-        if not domain_id:
-            domain_id = f"domain-name--{uuid.uuid4()}"
-            self.domain_id_by_value[domain_value] = domain_id
-            self.objects.append({
-                "type": "domain-name",
-                "spec_version": "2.1",
-                "id": domain_id,
-                "value": domain_value,
-                "object_marking_refs": [self.marking_id],
-            })
+        domain_id = self._domain_id(domain_value)
 
         # Indicator SDO
         ind_id = f"indicator--{uuid.uuid4()}"
@@ -409,10 +710,10 @@ class StixBundleBuilder:
             # Custom property for raw payload
             "x_firstwatch": source_payload,
         }
-        self.objects.append(indicator)
+        self._emit(indicator)
 
         # Relationship: indicator based-on domain-name
-        self.objects.append({
+        self._emit({
             "type": "relationship",
             "spec_version": "2.1",
             "id": f"relationship--{uuid.uuid4()}",
@@ -425,6 +726,26 @@ class StixBundleBuilder:
             "object_marking_refs": [self.marking_id],
         })
 
+    def _emit(self, obj: Dict[str, Any]) -> None:
+        self.objects.append(obj)
+
+    def _domain_object(self, domain_value: str, domain_id: str) -> Dict[str, Any]:
+        return {
+            "type": "domain-name",
+            "spec_version": "2.1",
+            "id": domain_id,
+            "value": domain_value,
+            "object_marking_refs": [self.marking_id],
+        }
+
+    def _domain_id(self, domain_value: str) -> str:
+        domain_id = self.domain_id_by_value.get(domain_value)
+        if not domain_id:
+            domain_id = f"domain-name--{uuid.uuid4()}"
+            self.domain_id_by_value[domain_value] = domain_id
+            self._emit(self._domain_object(domain_value, domain_id))
+        return domain_id
+
     def bundle(self) -> Dict[str, Any]:
         return {
             "type": "bundle",
@@ -434,16 +755,548 @@ class StixBundleBuilder:
         }
 
 
+class StreamingStixBundleWriter(StixBundleBuilder):
+    """
+    Same objects as StixBundleBuilder, written to disk as they are added
+    instead of kept in self.objects. Only the domain -> id map stays in memory.
+
+    bundle_size > 0 splits the output into <name>.0001.json, <name>.0002.json, ...
+    of about bundle_size objects each. Every bundle repeats the identity and
+    marking objects, and the domain-name objects its indicators refer to, so
+    each file is a self-contained bundle. Domain ids stay the same across files.
+    """
+
+    def __init__(self, path: str, *, bundle_size: int = 0, **kwargs: Any):
+        self.path = path
+        self.bundle_size = max(0, bundle_size)
+        self.paths: List[str] = []
+        self.objects_written = 0
+        self._fh = None
+        self._in_bundle = 0
+        self._domains_in_bundle: set = set()
+        super().__init__(**kwargs)
+        self.objects = []  # preamble is written at the start of each bundle instead
+
+    def _bundle_path_at(self, n: int) -> str:
+        if not self.bundle_size:
+            return self.path
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{n:04d}{ext or '.json'}"
+
+    def _bundle_path(self) -> str:
+        return self._bundle_path_at(len(self.paths) + 1)
+
+    def _open_bundle(self) -> None:
+        path = self._bundle_path()
+        self.paths.append(path)
+        self._fh = open(path, "w", encoding="utf-8")
+        self._fh.write(
+            '{\n  "type": "bundle",\n'
+            f'  "id": "bundle--{uuid.uuid4()}",\n'
+            '  "spec_version": "2.1",\n'
+            '  "objects": ['
+        )
+        self._in_bundle = 0
+        self._domains_in_bundle = set()
+        for obj in self.preamble:
+            self._emit(obj)
+
+    def _close_bundle(self) -> None:
+        if self._fh:
+            self._fh.write("\n  ]\n}\n")
+            self._fh.close()
+            self._fh = None
+
+    def _emit(self, obj: Dict[str, Any]) -> None:
+        if self._fh is None:
+            self._open_bundle()
+        self._fh.write(("\n    " if self._in_bundle == 0 else ",\n    ") + json.dumps(obj, ensure_ascii=False))
+        self._in_bundle += 1
+        self.objects_written += 1
+
+    def _domain_id(self, domain_value: str) -> str:
+        domain_id = self.domain_id_by_value.get(domain_value)
+        if not domain_id:
+            domain_id = f"domain-name--{uuid.uuid4()}"
+            self.domain_id_by_value[domain_value] = domain_id
+        if domain_value not in self._domains_in_bundle:
+            self._domains_in_bundle.add(domain_value)
+            self._emit(self._domain_object(domain_value, domain_id))
+        return domain_id
+
+    def add_hit(self, *, domain: str, source_payload: Dict[str, Any], mode: str) -> None:
+        # Keep a hit's domain, indicator and relationship in the same bundle
+        if self._fh is None or (self.bundle_size and self._in_bundle + 3 > self.bundle_size):
+            self._close_bundle()
+            self._open_bundle()
+        super().add_hit(domain=domain, source_payload=source_payload, mode=mode)
+
+    def position(self) -> Tuple[str, int, Any]:
+        """(current file, bytes written to it, file handle) for the checkpoint journal."""
+        if self._fh is None:
+            self._open_bundle()
+        self._fh.flush()
+        return self.paths[-1], self._fh.tell(), self._fh
+
+    @classmethod
+    def resume(cls, path: str, last_file: str, *, bundle_size: int = 0, **kwargs: Any) -> "StreamingStixBundleWriter":
+        """
+        Continue bundles written by an interrupted run, already truncated to the
+        last checkpoint. Rebuilds the identity/marking ids, the domain -> id map
+        and the per-bundle state from the files (one object per line).
+        Bundle files after last_file were started after the checkpoint and are removed.
+        """
+        writer = cls(path, bundle_size=bundle_size, **kwargs)
+        paths: List[str] = []
+        while True:
+            p = writer._bundle_path()
+            if not os.path.exists(p):
+                break
+            writer.paths.append(p)
+            paths.append(p)
+            if p == last_file or not writer.bundle_size:
+                break
+        if last_file not in paths:
+            raise RuntimeError(f"Checkpoint refers to {last_file}, which is not one of the bundle files")
+        # Without a bundle size there is one file, and _bundle_path_at() is always it
+        n = len(paths)
+        while writer.bundle_size and os.path.exists(writer._bundle_path_at(n + 1)):
+            os.remove(writer._bundle_path_at(n + 1))
+            n += 1
+
+        for p in paths:
+            writer._domains_in_bundle = set()
+            writer._in_bundle = 0
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip().rstrip(",")
+                    if not line.startswith("{") or line == "{":
+                        continue
+                    obj = json.loads(line)
+                    writer._in_bundle += 1
+                    writer.objects_written += 1
+                    if obj.get("type") == "identity":
+                        writer.identity_id = obj["id"]
+                    elif obj.get("type") == "marking-definition":
+                        writer.marking_id = obj["id"]
+                    elif obj.get("type") == "domain-name":
+                        writer.domain_id_by_value[obj["value"]] = obj["id"]
+                        writer._domains_in_bundle.add(obj["value"])
+        writer.preamble[0]["id"] = writer.identity_id
+        writer.preamble[1]["id"] = writer.marking_id
+        writer._fh = open(paths[-1], "a", encoding="utf-8")
+        return writer
+
+    def bundle(self) -> Dict[str, Any]:
+        raise RuntimeError("StreamingStixBundleWriter writes its bundles to disk; call close()")
+
+    def close(self) -> List[str]:
+        if not self.paths:
+            self._open_bundle()  # no hits: still write a bundle with identity + marking
+        self._close_bundle()
+        return self.paths
+
+
+# ----------------------------
+# Result cache
+# ----------------------------
+class ResultCache:
+    """
+    Lookup results keyed by (endpoint, query, page, per_page):
+      - in-memory LRU in front of an on-disk sqlite table, so repeat lookups
+        across runs (and across SOAR playbook invocations) skip the network
+      - per-endpoint TTLs for successful results
+      - 404s are cached for negative_ttl; other errors are never cached
+    Thread-safe; one instance is shared by all lookup threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        ttls: Dict[str, float],
+        negative_ttl: float,
+        memory_entries: int = 10000,
+    ):
+        self.path = path
+        self.ttls = ttls
+        self.negative_ttl = negative_ttl
+        self.memory_entries = max(0, memory_entries)
+        self.memory: "OrderedDict[Tuple[str, str, int, int], Tuple[float, Tuple[int, Any, str]]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " endpoint TEXT, query TEXT, page INTEGER, per_page INTEGER,"
+            " http_status INTEGER, body TEXT, error TEXT, expires REAL,"
+            " PRIMARY KEY (endpoint, query, page, per_page))"
+        )
+        self.db.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+        self.db.commit()
+
+    def get(self, endpoint: str, query: str, page: int = 0, per_page: int = 0) -> Optional[Tuple[int, Any, str]]:
+        key = (endpoint, query.lower(), page, per_page)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry[0] > now:
+                self.memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry[1]
+
+            row = self.db.execute(
+                "SELECT http_status, body, error, expires FROM results"
+                " WHERE endpoint = ? AND query = ? AND page = ? AND per_page = ? AND expires > ?",
+                key + (now,),
+            ).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            result = (row[0], json.loads(row[1]) if row[1] is not None else None, row[2])
+            self._remember(key, row[3], result)
+            self.counters["disk_hits"] += 1
+            return result
+
+    def put(self, endpoint: str, query: str, page: int, per_page: int, result: Tuple[int, Any, str]) -> None:
+        http_status, data, err = result
+        if 200 <= http_status < 300 and data is not None and not err:
+            ttl = self.ttls.get(endpoint, 0.0)
+        elif http_status == 404:
+            ttl = self.negative_ttl
+        else:
+            return
+        if ttl <= 0:
+            return
+
+        key = (endpoint, query.lower(), page, per_page)
+        expires = time.time() + ttl
+        body = json.dumps(data, ensure_ascii=False) if data is not None else None
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (http_status, body, err, expires),
+            )
+            self.db.commit()
+            self._remember(key, expires, result)
+            self.counters["stores"] += 1
+
+    def _remember(self, key: Tuple[str, str, int, int], expires: float, result: Tuple[int, Any, str]) -> None:
+        if not self.memory_entries:
+            return
+        self.memory[key] = (expires, result)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.counters)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+# ----------------------------
+# Rate limiting
+# ----------------------------
+MAX_SERVER_PAUSE_SECONDS = 300.0  # cap on Retry-After / rate-limit reset hints
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request of a run.
+    rate <= 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait_s = (1.0 - self.tokens) / self.rate
+            time.sleep(wait_s)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After is either delta-seconds or an HTTP date; None if absent or unparseable.
+
+    The scripts are standalone, so scripts/api-examples/kyc.py has a copy; keep the two identical.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Rate-limit reset headers are seconds from now, or an epoch timestamp."""
+    try:
+        reset = float(value) if value else None
+    except ValueError:
+        return None
+    if reset is None:
+        return None
+    if reset > 1e9:
+        reset -= time.time()
+    return max(0.0, reset)
+
+
+class AdaptiveLimiter:
+    """
+    Shared by all client requests (check_domain, fuzzy_search, get_quota):
+      - the token bucket caps requests/second
+      - an AIMD window caps requests in flight: +1/window per success,
+        halved on every 429/503, never below 1 or above max_concurrency
+      - Retry-After and exhausted rate-limit headers pause every caller
+        until the server says to continue
+    """
+
+    def __init__(self, rate: float, burst: int = 1, max_concurrency: int = 1):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_window = float(max(1, max_concurrency))
+        self.window = self.max_window
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+        self.counters: Dict[str, Any] = {
+            "requests": 0,
+            "throttled": 0,
+            "server_errors": 0,
+            "retries": 0,
+            "paused_seconds": 0.0,
+        }
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self.cond:
+            while self.in_flight >= int(self.window):
+                self.cond.wait()
+            self.in_flight += 1
+            self.counters["requests"] += 1
+            pause = self.paused_until - time.monotonic()
+        try:
+            if pause > 0:
+                time.sleep(pause)
+            self.bucket.acquire()
+            yield
+        finally:
+            with self.cond:
+                self.in_flight -= 1
+                self.cond.notify_all()
+
+    def record(self, resp: requests.Response) -> float:
+        """Adjust the window and pause from one response; returns the pause applied (0 if none)."""
+        status = resp.status_code
+        headers = resp.headers
+        with self.cond:
+            pause = None
+            if status in (429, 503):
+                self.counters["throttled"] += 1
+                self.window = max(1.0, self.window / 2.0)
+                pause = _parse_retry_after(headers.get("Retry-After"))
+            elif 500 <= status <= 599:
+                self.counters["server_errors"] += 1
+            elif 200 <= status < 300:
+                self.window = min(self.max_window, self.window + 1.0 / self.window)
+
+            remaining = headers.get("X-RateLimit-Remaining", headers.get("RateLimit-Remaining"))
+            if remaining is not None and remaining.strip() == "0":
+                reset = _parse_reset(headers.get("X-RateLimit-Reset", headers.get("RateLimit-Reset")))
+                if reset is not None:
+                    pause = max(pause or 0.0, reset)
+
+            if pause:
+                pause = min(pause, MAX_SERVER_PAUSE_SECONDS)
+                until = time.monotonic() + pause
+                if until > self.paused_until:
+                    self.counters["paused_seconds"] += until - max(self.paused_until, time.monotonic())
+                    self.paused_until = until
+            self.cond.notify_all()
+            return pause or 0.0
+
+    def count_retry(self) -> None:
+        with self.cond:
+            self.counters["retries"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cond:
+            out = dict(self.counters)
+            out["window"] = round(self.window, 2)
+            out["paused_seconds"] = round(out["paused_seconds"], 2)
+            return out
+
+
+# ----------------------------
+# Auth (JWT lifecycle)
+# ----------------------------
+def _jwt_expiry(token: str) -> Optional[float]:
+    """exp claim of a JWT (epoch seconds), read without verifying the signature."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return None
+
+
+class TokenManager:
+    """
+    Bearer token shared by all lookup threads.
+
+    token() returns the current token and logs in when there is none, or when
+    its JWT exp claim is less than refresh_margin seconds away. Logins are
+    single-flight: one caller logs in while the others wait for its token (or
+    its error). During a proactive refresh the old token is still valid, so
+    other callers keep using it instead of waiting. After a 401, invalidate()
+    drops the rejected token; callers that already hold a newer one are not
+    affected, so a burst of 401s causes one login.
+    """
+
+    def __init__(self, login: Callable[[], str], *, refresh_margin: float = DEFAULT_TOKEN_REFRESH_MARGIN_SECONDS):
+        self._login = login
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at: Optional[float] = None
+        self._rejected = False
+        self._refreshing = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self.counters = {"logins": 0, "proactive": 0, "after_401": 0, "failures": 0, "login_seconds": 0.0, "max_login_seconds": 0.0}
+
+    def _usable(self, margin: float) -> bool:
+        if not self._token:
+            return False
+        return self._expires_at is None or time.time() < self._expires_at - margin
+
+    def token(self) -> str:
+        with self._cond:
+            waited = False
+            while self._refreshing and not self._usable(0.0):
+                waited = True
+                self._cond.wait()
+            if self._usable(self.refresh_margin) or (self._refreshing and self._usable(0.0)):
+                return self._token
+            if waited and self._error is not None:
+                raise RuntimeError(f"Login failed: {self._error}") from self._error
+            if self._token:
+                self.counters["proactive"] += 1
+            elif self._rejected:
+                self.counters["after_401"] += 1
+            self._refreshing = True
+
+        start = time.monotonic()
+        try:
+            token = self._login()
+        except BaseException as e:
+            with self._cond:
+                self._refreshing = False
+                self._error = e
+                self.counters["failures"] += 1
+                self._cond.notify_all()
+            raise
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._token = token
+            self._expires_at = _jwt_expiry(token)
+            self._rejected = False
+            self._refreshing = False
+            self._error = None
+            self.counters["logins"] += 1
+            self.counters["login_seconds"] += elapsed
+            self.counters["max_login_seconds"] = max(self.counters["max_login_seconds"], elapsed)
+            self._cond.notify_all()
+        return token
+
+    def invalidate(self, token: str) -> None:
+        """Forget token after the server rejected it (no-op if it was already replaced)."""
+        with self._cond:
+            if self._token == token:
+                self._token = None
+                self._expires_at = None
+                self._rejected = True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = dict(self.counters)
+            expires_at = self._expires_at
+        out["login_seconds"] = round(out["login_seconds"], 3)
+        out["max_login_seconds"] = round(out["max_login_seconds"], 3)
+        out["expires_in"] = round(expires_at - time.time()) if expires_at else None
+        return out
+
+
 # ----------------------------
 # FirstWatch client
 # ----------------------------
+def _total_pages(data: Any) -> int:
+    if isinstance(data, dict):
+        try:
+            return int(data.get("total_pages", 1))
+        except Exception:
+            return 1
+    return 1
+
+
 class FirstWatchClient:
-    def __init__(self, cfg: FWConfig):
+    def __init__(
+        self,
+        cfg: FWConfig,
+        limiter: Optional[AdaptiveLimiter] = None,
+        cache: Optional[ResultCache] = None,
+    ):
         self.cfg = cfg
+        self.cache = cache
+        self.limiter = limiter or AdaptiveLimiter(cfg.requests_per_second, cfg.burst, cfg.concurrency)
         self.session = requests.Session()
-        self.token: Optional[str] = None
+        # Enough pooled connections for every lookup thread
+        adapter = HTTPAdapter(pool_maxsize=max(10, cfg.concurrency))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.tokens = TokenManager(self._login)
+        self._pages: Optional[ThreadPoolExecutor] = None
+        self._pages_lock = threading.Lock()
+
+    def close(self) -> None:
+        if self._pages:
+            self._pages.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
 
     def login(self) -> str:
+        """Return a valid token, logging in if needed (shared with all lookup threads)."""
+        return self.tokens.token()
+
+    def _login(self) -> str:
         resp = self.session.post(
             self.cfg.login_url,
             data={"username": self.cfg.username, "password": self.cfg.password},
@@ -462,25 +1315,49 @@ class FirstWatchClient:
         if not token:
             raise RuntimeError(f"Login response missing token: {data}")
 
-        self.token = token
         return token
 
-    def _auth_headers(self) -> Dict[str, str]:
-        if not self.token:
-            self.login()
-        return {"Authorization": f"Bearer {self.token}"}
+    def _retry_sleep(self, attempt: int, paused: float = 0.0) -> None:
+        # A Retry-After / reset hint already paused the limiter for everyone.
+        if paused > 0:
+            return
+        # Exponential backoff with equal jitter so retrying threads spread out
+        cap = min(10.0, 0.75 * (2 ** (attempt - 1)))
+        time.sleep(cap / 2 + random.uniform(0, cap / 2))
+
+    def _get(self, url: str, **kwargs: Any) -> Tuple[requests.Response, float]:
+        """One GET through the limiter: (response, pause the limiter applied for it)."""
+        with self.limiter.slot():
+            resp = self.session.get(url, timeout=self.cfg.timeout, **kwargs)
+        return resp, self.limiter.record(resp)
+
+    def _request(self, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """GET with one re-login on 401 and retries on 429/5xx; returns the last response."""
+        token = self.tokens.token()
+        reauthed = False
+        attempt = 0
+
+        while True:
+            resp, paused = self._get(url, headers={"Authorization": f"Bearer {token}"}, params=params)
+
+            if resp.status_code == 401 and not reauthed:
+                # Rejected before its exp (revoked, clock skew): shared re-login, then retry
+                reauthed = True
+                self.tokens.invalidate(token)
+                token = self.tokens.token()
+                continue
+
+            attempt += 1
+            if resp.status_code in (429,) or (500 <= resp.status_code <= 599):
+                if attempt <= self.cfg.max_retries:
+                    self.limiter.count_retry()
+                    self._retry_sleep(attempt, paused)
+                    continue
 
-    def _retry_sleep(self, attempt: int) -> None:
-        sleep_s = min(10.0, 0.75 * (2 ** (attempt - 1)))
-        time.sleep(sleep_s)
+            return resp
 
     def get_quota(self) -> Tuple[int, Any, str]:
-        url = self.cfg.quota_url
-        resp = self.session.get(url, headers=self._auth_headers(), timeout=self.cfg.timeout)
-
-        if resp.status_code == 401:
-            self.login()
-            resp = self.session.get(url, headers=self._auth_headers(), timeout=self.cfg.timeout)
+        resp = self._request(self.cfg.quota_url)
 
         if not (200 <= resp.status_code < 300):
             return resp.status_code, resp.text, resp.text.strip()
@@ -490,70 +1367,340 @@ class FirstWatchClient:
         except json.JSONDecodeError:
             return resp.status_code, resp.text, ""
 
-    def check_domain(self, domain: str) -> Tuple[int, Optional[Dict[str, Any]], str]:
-        url = f"{self.cfg.feed_check_url}/{domain}"
-        headers = self._auth_headers()
-
-        for attempt in range(1, self.cfg.max_retries + 2):
-            resp = self.session.get(url, headers=headers, timeout=self.cfg.timeout)
-
-            if resp.status_code == 401:
-                self.login()
-                headers = self._auth_headers()
-                resp = self.session.get(url, headers=headers, timeout=self.cfg.timeout)
-
-            if resp.status_code in (429,) or (500 <= resp.status_code <= 599):
-                if attempt <= self.cfg.max_retries:
-                    self._retry_sleep(attempt)
-                    continue
+    def _json_result(self, resp: requests.Response) -> Tuple[int, Optional[Dict[str, Any]], str]:
+        if not (200 <= resp.status_code < 300):
+            return resp.status_code, None, resp.text.strip()
 
-            if not (200 <= resp.status_code < 300):
-                return resp.status_code, None, resp.text.strip()
+        try:
+            return resp.status_code, resp.json(), ""
+        except json.JSONDecodeError:
+            return resp.status_code, None, f"Non-JSON response: {resp.text.strip()}"
 
-            try:
-                return resp.status_code, resp.json(), ""
-            except json.JSONDecodeError:
-                return resp.status_code, None, f"Non-JSON response: {resp.text.strip()}"
+    def check_domain(self, domain: str) -> Tuple[int, Optional[Dict[str, Any]], str]:
+        if self.cache:
+            cached = self.cache.get("check", domain)
+            if cached is not None:
+                return cached
 
-        return 0, None, "Unknown error"
+        result = self._json_result(self._request(f"{self.cfg.feed_check_url}/{domain}"))
+        if self.cache:
+            self.cache.put("check", domain, 0, 0, result)
+        return result
 
     def fuzzy_search(self, query: str, page: int = 1, per_page: int = 10) -> Tuple[int, Optional[Dict[str, Any]], str]:
-        url = f"{self.cfg.feed_search_url}/{query}"
+        if self.cache:
+            cached = self.cache.get("search", query, page, per_page)
+            if cached is not None:
+                return cached
+
         params = {"page": page, "per_page": per_page}
-        headers = self._auth_headers()
+        result = self._json_result(self._request(f"{self.cfg.feed_search_url}/{query}", params=params))
+        if self.cache:
+            self.cache.put("search", query, page, per_page, result)
+        return result
+
+    def _page_pool(self) -> ThreadPoolExecutor:
+        # Separate from the lookup pool: lookup threads block on these futures.
+        with self._pages_lock:
+            if self._pages is None:
+                self._pages = ThreadPoolExecutor(
+                    max_workers=max(1, self.cfg.concurrency),
+                    thread_name_prefix="fw-pages",
+                )
+            return self._pages
 
-        for attempt in range(1, self.cfg.max_retries + 2):
-            resp = self.session.get(url, headers=headers, params=params, timeout=self.cfg.timeout)
+    def iter_fuzzy_pages(
+        self, query: str, per_page: int = 10, max_pages: int = 1
+    ) -> Iterator[Tuple[int, int, Optional[Dict[str, Any]], str]]:
+        """
+        Yield (page, http_status, data, err) in page order.
+        Page 1 is fetched first for total_pages; pages 2..min(total_pages, max_pages)
+        are then requested concurrently, paced by the shared limiter.
+        Pages not yet started are cancelled if the caller stops early.
+        """
+        http_status, data, err = self.fuzzy_search(query, page=1, per_page=per_page)
+        yield 1, http_status, data, err
 
-            if resp.status_code == 401:
-                self.login()
-                headers = self._auth_headers()
-                resp = self.session.get(url, headers=headers, params=params, timeout=self.cfg.timeout)
+        if err or data is None or not (data.get("results") if isinstance(data, dict) else None):
+            return
+        last = min(max_pages, _total_pages(data))
+        if last <= 1:
+            return
 
-            if resp.status_code in (429,) or (500 <= resp.status_code <= 599):
-                if attempt <= self.cfg.max_retries:
-                    self._retry_sleep(attempt)
-                    continue
+        pool = self._page_pool()
+        futures = [(page, pool.submit(self.fuzzy_search, query, page, per_page)) for page in range(2, last + 1)]
+        try:
+            for page, fut in futures:
+                yield (page,) + fut.result()
+        finally:
+            for _, fut in futures:
+                fut.cancel()
 
-            if not (200 <= resp.status_code < 300):
-                return resp.status_code, None, resp.text.strip()
 
-            try:
-                return resp.status_code, resp.json(), ""
-            except json.JSONDecodeError:
-                return resp.status_code, None, f"Non-JSON response: {resp.text.strip()}"
+# ----------------------------
+# Checkpoint journal (--resume)
+# ----------------------------
+class CheckpointJournal:
+    """
+    Append-only JSONL record of completed inputs, written by the output thread
+    after each batch of inputs is in the output file:
+      {"d": [domains], "f": output file, "o": output size after this batch}
+    A batch is one line, so a crash never journals part of it (a torn last line
+    is ignored). Every fsync_every inputs (or fsync_seconds), checked between
+    batches, the output file and then the journal are fsync'ed, so a journaled
+    offset never points past durable output.
+    On resume, the output is truncated back to the last journaled offset and
+    journaled domains are skipped.
+    """
 
-        return 0, None, "Unknown error"
+    def __init__(self, path: str, *, append: bool, fsync_every: int = 100, fsync_seconds: float = 5.0):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_seconds = fsync_seconds
+        self.fh = open(path, "a" if append else "w", encoding="utf-8")
+        self._since_sync = 0
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def load(path: str) -> Tuple[set, Optional[Dict[str, Any]]]:
+        """Return (completed domains, last entry) from an existing journal."""
+        completed: set = set()
+        last: Optional[Dict[str, Any]] = None
+        if not os.path.exists(path):
+            return completed, last
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final line from a crash
+                domains = entry["d"]
+                completed.update([domains] if isinstance(domains, str) else domains)
+                last = entry
+        return completed, last
+
+    def record(self, domains: List[str], out_path: str, offset: int, out_fh=None) -> None:
+        self.fh.write(json.dumps({"d": domains, "f": out_path, "o": offset}, ensure_ascii=False) + "\n")
+        self._since_sync += len(domains)
+        if self._since_sync >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_seconds:
+            self.sync(out_fh)
+
+    def sync(self, out_fh=None) -> None:
+        if out_fh is not None:
+            out_fh.flush()
+            os.fsync(out_fh.fileno())
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        self._since_sync = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, out_fh=None) -> None:
+        self.sync(out_fh)
+        self.fh.close()
+
+
+def rewind_output(last: Dict[str, Any]) -> None:
+    """Drop output written after the last journaled input (it will be redone)."""
+    with open(last["f"], "r+b") as f:
+        f.truncate(last["o"])
 
 
 # ----------------------------
 # Processing
 # ----------------------------
+@dataclass
+class LookupResult:
+    """Everything one input produced, so lookups can run on worker threads and be written by one thread."""
+    domain: str
+    records: List[Dict[str, Any]]
+    had_hit: bool
+    messages: List[str]
+
+
+def lookup_domain(
+    domain: str,
+    client: FirstWatchClient,
+    *,
+    fuzzy: bool,
+    per_page: int,
+    max_pages: int,
+    fallback_fuzzy: bool,
+) -> LookupResult:
+    records: List[Dict[str, Any]] = []
+    messages: List[str] = []
+    had_hit = False
+
+    # -------- Exact lookup --------
+    if not fuzzy:
+        http_status, data, err = client.check_domain(domain)
+        if data is not None and not err and 200 <= http_status < 300:
+            had_hit = True
+            records.append(build_record(
+                input_query=domain,
+                matched_domain=domain,
+                mode="exact",
+                status="success",
+                http_status=http_status,
+                error="",
+                payload=data,
+            ))
+            messages.append("  ✓ exact match")
+        else:
+            messages.append(f"  ✗ exact lookup failed (HTTP {http_status})")
+            if not fallback_fuzzy:
+                records.append(build_record(
+                    input_query=domain,
+                    matched_domain="",
+                    mode="exact",
+                    status="failed",
+                    http_status=http_status,
+                    error=err or "Exact lookup failed",
+                    payload=None,
+                ))
+
+    # -------- Fuzzy lookup (primary or fallback) --------
+    if fuzzy or (fallback_fuzzy and not had_hit):
+        found_any = False
+        last_http = 200
+        last_err = ""
+
+        for page, http_status, data, err in client.iter_fuzzy_pages(domain, per_page=per_page, max_pages=max_pages):
+            last_http, last_err = http_status, err
+
+            if err or data is None:
+                records.append(build_record(
+                    input_query=domain,
+                    matched_domain="",
+                    mode="fuzzy",
+                    status="failed",
+                    http_status=http_status,
+                    error=err or "Fuzzy search failed",
+                    payload=None,
+                ))
+                break
+
+            results = data.get("results", []) if isinstance(data, dict) else []
+            if not results:
+                break
+
+            for item in results:
+                matched = (item.get("domain_name", "") if isinstance(item, dict) else "") or ""
+                matched = matched.strip().lower()
+
+                found_any = True
+                had_hit = True
+                records.append(build_record(
+                    input_query=domain,
+                    matched_domain=matched,
+                    mode="fuzzy",
+                    status="success",
+                    http_status=http_status,
+                    error="",
+                    payload=item,
+                ))
+
+        if not found_any:
+            records.append(build_record(
+                input_query=domain,
+                matched_domain="",
+                mode="fuzzy",
+                status="failed",
+                http_status=last_http,
+                error=last_err or "No matches",
+                payload={"results": [], "page": 1, "per_page": per_page},
+            ))
+
+        if found_any:
+            messages.append("  ✓ fuzzy matches written")
+        else:
+            messages.append("  ✗ no fuzzy matches")
+
+    return LookupResult(domain=domain, records=records, had_hit=had_hit, messages=messages)
+
+
+def run_lookups(
+    domains: Iterable[str],
+    lookup: Callable[[str], LookupResult],
+    *,
+    concurrency: int,
+    ordered: bool,
+) -> Iterator[LookupResult]:
+    """
+    Run lookup() over the domains with at most `concurrency` lookups in flight.
+    Results come back in input order, or as they complete when ordered=False.
+    Request pacing is left to the client's shared rate limiter.
+    """
+    if concurrency <= 1:
+        for domain in domains:
+            yield lookup(domain)
+        return
+
+    window = 2 * concurrency  # bound queued work so large inputs are not submitted all at once
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="fw-lookup") as pool:
+        if ordered:
+            inflight: deque = deque()
+            for domain in domains:
+                inflight.append(pool.submit(lookup, domain))
+                if len(inflight) >= window:
+                    yield inflight.popleft().result()
+            while inflight:
+                yield inflight.popleft().result()
+        else:
+            pending = set()
+            for domain in domains:
+                pending.add(pool.submit(lookup, domain))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        yield fut.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+
+
+class ProgressReporter:
+    """
+    Progress output for process_domains.
+      lines : a "Processed" line per input plus its messages (the default)
+      bar   : one status line on stderr, redrawn at most every interval seconds
+      quiet : nothing
+    """
+
+    def __init__(self, mode: str = "lines", total: Optional[int] = None, interval: float = 0.5):
+        self.mode = mode
+        self.total = f"/{total}" if total is not None else ""
+        self.interval = interval
+        self._start = time.monotonic()
+        self._last = 0.0
+
+    def update(self, i: int, result: "LookupResult", stats: Dict[str, int]) -> None:
+        if self.mode == "lines":
+            sys.stdout.write("\n".join([f"[{i}{self.total}] Processed: {result.domain}", *result.messages]) + "\n")
+        elif self.mode == "bar":
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                self._draw(i, stats, now)
+
+    def _draw(self, i: int, stats: Dict[str, int], now: float) -> None:
+        rate = i / max(now - self._start, 1e-6)
+        sys.stderr.write(
+            f"\r[{i}{self.total}] hits {stats['hits']}  failed {stats['failed_inputs']}  {rate:.1f}/s "
+        )
+        sys.stderr.flush()
+
+    def close(self, stats: Dict[str, int]) -> None:
+        if self.mode == "bar":
+            self._draw(stats["inputs"], stats, time.monotonic())
+            sys.stderr.write("\n")
+
+
 def process_domains(
-    domains: List[str],
+    domains: Iterable[str],
     client: FirstWatchClient,
     cfg: FWConfig,
-    out_fh,
+    writer: Optional[ResultWriter],
     *,
     output_format: str,
     fuzzy: bool,
@@ -561,145 +1708,51 @@ def process_domains(
     max_pages: int,
     fallback_fuzzy: bool,
     stix_builder: Optional[StixBundleBuilder],
+    ordered: bool = True,
+    journal: Optional[CheckpointJournal] = None,
+    progress: Optional[ProgressReporter] = None,
 ) -> Dict[str, int]:
-    stats = {"inputs": len(domains), "records_written": 0, "hits": 0, "failed_inputs": 0}
+    stats = {"inputs": 0, "records_written": 0, "hits": 0, "failed_inputs": 0}
+    if progress is None:
+        progress = ProgressReporter("lines", len(domains) if hasattr(domains, "__len__") else None)
 
-    for i, domain in enumerate(domains, 1):
-        print(f"[{i}/{stats['inputs']}] Processing: {domain}")
-        had_hit = False
+    def lookup(domain: str) -> LookupResult:
+        return lookup_domain(
+            domain,
+            client,
+            fuzzy=fuzzy,
+            per_page=per_page,
+            max_pages=max_pages,
+            fallback_fuzzy=fallback_fuzzy,
+        )
 
-        # -------- Exact lookup --------
-        if not fuzzy:
-            http_status, data, err = client.check_domain(domain)
-            if data is not None and not err and 200 <= http_status < 300:
-                had_hit = True
+    # Only this thread hands out output and touches stats / the STIX builder.
+    # csv/json records go to the writer, which journals them once they are written.
+    results = run_lookups(domains, lookup, concurrency=cfg.concurrency, ordered=ordered)
+    for i, result in enumerate(results, 1):
+        stats["inputs"] = i
+        if output_format in ("csv", "json") and writer:
+            writer.add(result.domain, result.records)
+            stats["records_written"] += len(result.records)
+
+        for rec in result.records:
+            if rec["status"] == "success":
                 stats["hits"] += 1
 
-                if output_format in ("csv", "json"):
-                    rec = build_record(
-                        input_query=domain,
-                        matched_domain=domain,
-                        mode="exact",
-                        status="success",
-                        http_status=http_status,
-                        error="",
-                        payload=data,
-                    )
-                    write_record(out_fh, output_format, rec)
-                    stats["records_written"] += 1
-
-                if output_format == "stix" and stix_builder:
-                    stix_builder.add_hit(domain=domain, source_payload=data, mode="exact")
-
-                print("  ✓ exact match")
-            else:
-                print(f"  ✗ exact lookup failed (HTTP {http_status})")
-                if not fallback_fuzzy:
-                    if output_format in ("csv", "json"):
-                        rec = build_record(
-                            input_query=domain,
-                            matched_domain="",
-                            mode="exact",
-                            status="failed",
-                            http_status=http_status,
-                            error=err or "Exact lookup failed",
-                            payload=None,
-                        )
-                        write_record(out_fh, output_format, rec)
-                        stats["records_written"] += 1
-
-        # -------- Fuzzy lookup (primary or fallback) --------
-        if fuzzy or (fallback_fuzzy and not had_hit):
-            found_any = False
-            last_http = 200
-            last_err = ""
-
-            for page in range(1, max_pages + 1):
-                http_status, data, err = client.fuzzy_search(domain, page=page, per_page=per_page)
-                last_http, last_err = http_status, err
-
-                if err or data is None:
-                    if output_format in ("csv", "json"):
-                        rec = build_record(
-                            input_query=domain,
-                            matched_domain="",
-                            mode="fuzzy",
-                            status="failed",
-                            http_status=http_status,
-                            error=err or "Fuzzy search failed",
-                            payload=None,
-                        )
-                        write_record(out_fh, output_format, rec)
-                        stats["records_written"] += 1
-                    break
-
-                results = data.get("results", []) if isinstance(data, dict) else []
-                if not results:
-                    break
-
-                for item in results:
-                    matched = (item.get("domain_name", "") if isinstance(item, dict) else "") or ""
-                    matched = matched.strip().lower()
-
-                    found_any = True
-                    had_hit = True
-                    stats["hits"] += 1
-
-                    if output_format in ("csv", "json"):
-                        rec = build_record(
-                            input_query=domain,
-                            matched_domain=matched,
-                            mode="fuzzy",
-                            status="success",
-                            http_status=http_status,
-                            error="",
-                            payload=item,
-                        )
-                        write_record(out_fh, output_format, rec)
-                        stats["records_written"] += 1
-
-                    if output_format == "stix" and stix_builder:
-                        # Prefer the matched domain value for the STIX object
-                        stix_domain = matched if matched else domain
-                        stix_builder.add_hit(domain=stix_domain, source_payload=item, mode="fuzzy")
-
-                total_pages = 1
-                if isinstance(data, dict):
-                    try:
-                        total_pages = int(data.get("total_pages", 1))
-                    except Exception:
-                        total_pages = 1
-                if page >= total_pages:
-                    break
-
-            if not found_any and output_format in ("csv", "json"):
-                rec = build_record(
-                    input_query=domain,
-                    matched_domain="",
-                    mode="fuzzy",
-                    status="failed",
-                    http_status=last_http,
-                    error=last_err or "No matches",
-                    payload={"results": [], "page": 1, "per_page": per_page},
-                )
-                write_record(out_fh, output_format, rec)
-                stats["records_written"] += 1
+            if output_format == "stix" and stix_builder and rec["status"] == "success":
+                # For STIX output we only emit hits; failures/no-matches are not indicators.
+                # Prefer the matched domain value for the STIX object
+                stix_domain = rec["matched_domain"] or rec["input_query"]
+                stix_builder.add_hit(domain=stix_domain, source_payload=rec["payload"], mode=rec["mode"])
 
-            if found_any:
-                print("  ✓ fuzzy matches written")
-            else:
-                print("  ✗ no fuzzy matches")
-
-        if not had_hit and output_format == "stix":
-            # For STIX output we typically only emit hits; failures/no-matches are not indicators.
-            pass
-
-        if not had_hit:
+        if not result.had_hit:
             stats["failed_inputs"] += 1
+        progress.update(i, result, stats)
 
-        if i < stats["inputs"] and cfg.delay > 0:
-            time.sleep(cfg.delay)
+        if journal and isinstance(stix_builder, StreamingStixBundleWriter):
+            journal.record([result.domain], *stix_builder.position())
 
+    progress.close(stats)
     return stats
 
 
@@ -719,9 +1772,25 @@ base_url = {DEFAULT_BASE_URL}
 delay = {DEFAULT_DELAY_SECONDS}
 timeout = {DEFAULT_TIMEOUT_SECONDS}
 max_retries = {DEFAULT_MAX_RETRIES}
+# Lookups in flight at once (1 = one domain at a time)
+concurrency = {DEFAULT_CONCURRENCY}
+# Requests/second shared by all lookups; 0 = one request per `delay` seconds
+# when concurrency is 1, and no fixed cap (only 429/503 backoff) above that
+rate_limit = 0
+burst = 1
 check_quota_before_run = true
 stop_if_quota_insufficient = false
 
+[cache]
+# Optional sqlite file caching lookup results between runs (empty = no cache)
+path =
+# Seconds to keep exact / fuzzy results, and 404 (not found) answers
+exact_ttl = {DEFAULT_CACHE_TTL_SECONDS}
+fuzzy_ttl = {DEFAULT_CACHE_TTL_SECONDS}
+negative_ttl = {DEFAULT_CACHE_NEGATIVE_TTL_SECONDS}
+# Results also kept in memory for the run
+memory_entries = {DEFAULT_CACHE_MEMORY_ENTRIES}
+
 [output]
 # Default output format if --output-format is not provided
 # Options: csv, json  (json is JSONL), stix (STIX 2.1 bundle JSON)
@@ -767,6 +1836,34 @@ def main() -> None:
     parser.add_argument("--per-page", type=int, default=10, help="Fuzzy search results per page (default: 10)")
     parser.add_argument("--max-pages", type=int, default=1, help="Max pages per fuzzy search input (default: 1)")
 
+    # Input handling
+    parser.add_argument("--registrable-domain", action="store_true", help="Collapse inputs to their registrable domain via the public suffix list (needs tldextract)")
+    parser.add_argument("--bloom-capacity", type=int, default=0, help="De-dupe inputs with a Bloom filter sized for N domains instead of an in-memory set")
+
+    # Concurrency
+    parser.add_argument("--concurrency", type=int, default=None, help="Lookups in flight at once (default: config [api].concurrency)")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Max requests/second across all lookups (default: config [api].rate_limit; "
+                        "if unset, 1/delay with --concurrency 1 and no fixed cap with more)")
+    parser.add_argument("--unordered", action="store_true", help="Write results as lookups complete instead of in input order")
+
+    # Result cache
+    parser.add_argument("--cache", default=None, help="sqlite file caching lookup results (default: config [cache].path)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the result cache even if configured")
+
+    # Streaming STIX output
+    parser.add_argument("--stix-stream", action="store_true", help="Write the STIX bundle incrementally instead of building it in memory")
+    parser.add_argument("--stix-bundle-size", type=int, default=0, help="Split STIX output into bundles of about N objects (implies --stix-stream)")
+
+    # Output writing
+    parser.add_argument("--compress", choices=["gzip", "zstd"], default=None, help="Compress csv/json output (default: from the output name, .gz or .zst)")
+    parser.add_argument("--write-batch", type=int, default=500, help="Records per csv/json output write (default: 500)")
+    parser.add_argument("--write-queue", type=int, default=1024, help="Results queued for the output writer thread; 0 writes inline (default: 1024)")
+    parser.add_argument("--progress", choices=["lines", "bar", "quiet"], default="lines", help="Per-input lines, a single progress line, or nothing (default: lines)")
+
+    # Checkpoint / resume
+    parser.add_argument("--resume", action="store_true", help="Skip inputs recorded in <output>.journal and append to the existing output")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="fsync output and journal every N inputs (default: 100)")
+
     # Output format override
     parser.add_argument(
         "--output-format",
@@ -785,20 +1882,56 @@ def main() -> None:
         parser.error("csv_file and output_file are required (unless using --create-config)")
 
     cfg = load_config(args.config)
+    if args.concurrency is not None:
+        cfg.concurrency = max(1, args.concurrency)
+    if args.rate_limit is not None:
+        cfg.rate_limit = args.rate_limit
+    if args.cache is not None:
+        cfg.cache_path = args.cache
+    if args.no_cache:
+        cfg.cache_path = ""
     output_format = (args.output_format or cfg.output_format).lower()
 
     print(f"Using base URL: {cfg.base_url}")
+    rps = cfg.requests_per_second
+    print(f"Concurrency: {cfg.concurrency}, rate limit: {f'{rps:g} req/s' if rps > 0 else 'none (backs off on 429/503)'}")
     if output_format == "json":
         print("Output format: json (JSONL)")
     else:
         print(f"Output format: {output_format}")
 
-    domains = load_domains_from_csv(args.csv_file)
-    print(f"Loaded {len(domains)} unique domains from {args.csv_file}")
-    if not domains:
+    domains = DomainInput(
+        args.csv_file,
+        registrable=args.registrable_domain,
+        bloom_capacity=max(0, args.bloom_capacity),
+    )
+    if domains.is_empty():
         raise SystemExit("No domains found. Check your input file.")
+    print(f"Reading domains from {args.csv_file}" + (" (collapsed to registrable domains)" if args.registrable_domain else ""))
+
+    journal_path = f"{args.output_file}.journal"
+    completed: set = set()
+    last_checkpoint: Optional[Dict[str, Any]] = None
+    if args.resume:
+        completed, last_checkpoint = CheckpointJournal.load(journal_path)
+        if last_checkpoint:
+            rewind_output(last_checkpoint)
+            print(f"Resuming: {len(completed)} inputs already done (from {journal_path})")
+        else:
+            print(f"Nothing to resume in {journal_path}; starting from the beginning")
+    todo = (d for d in domains if d not in completed)
+
+    cache: Optional[ResultCache] = None
+    if cfg.cache_path:
+        cache = ResultCache(
+            cfg.cache_path,
+            ttls={"check": cfg.cache_exact_ttl, "search": cfg.cache_fuzzy_ttl},
+            negative_ttl=cfg.cache_negative_ttl,
+            memory_entries=cfg.cache_memory_entries,
+        )
+        print(f"Result cache: {cfg.cache_path}")
 
-    client = FirstWatchClient(cfg)
+    client = FirstWatchClient(cfg, cache=cache)
 
     # Optional quota check (will login)
     if cfg.check_quota_before_run:
@@ -811,11 +1944,17 @@ def main() -> None:
                 remaining = int(qdata.get("remaining", -1))
                 monthly_quota = int(qdata.get("monthly_quota", -1))
                 print(f"Quota remaining: {remaining} / {monthly_quota}")
-                if cfg.stop_if_quota_insufficient and remaining >= 0 and remaining < len(domains):
-                    raise SystemExit(
-                        f"Insufficient quota: remaining={remaining}, inputs={len(domains)}. "
-                        "Set stop_if_quota_insufficient=false to override."
-                    )
+                if cfg.stop_if_quota_insufficient and remaining >= 0:
+                    # Needs one extra pass over the input to count unique domains
+                    for _ in domains:
+                        pass
+                    unique = max(0, domains.counters["unique"] - len(completed))
+                    print(f"Unique inputs: {unique}")
+                    if remaining < unique:
+                        raise SystemExit(
+                            f"Insufficient quota: remaining={remaining}, inputs={unique}. "
+                            "Set stop_if_quota_insufficient=false to override."
+                        )
         except Exception as e:
             print(f"WARNING: quota check error: {e}")
 
@@ -825,60 +1964,114 @@ def main() -> None:
     print("Authenticated.")
 
     stix_builder: Optional[StixBundleBuilder] = None
+    stix_stream = args.stix_stream or args.stix_bundle_size > 0 or (args.resume and output_format == "stix")
     if output_format == "stix":
-        stix_builder = StixBundleBuilder(
+        stix_kwargs = dict(
             identity_name=cfg.stix_identity_name,
             tlp=cfg.stix_tlp,
             classification=cfg.stix_classification,
             labels=cfg.stix_labels or [],
         )
+        if stix_stream and last_checkpoint:
+            stix_builder = StreamingStixBundleWriter.resume(
+                args.output_file, last_checkpoint["f"], bundle_size=args.stix_bundle_size, **stix_kwargs
+            )
+        elif stix_stream:
+            stix_builder = StreamingStixBundleWriter(args.output_file, bundle_size=args.stix_bundle_size, **stix_kwargs)
+        else:
+            stix_builder = StixBundleBuilder(**stix_kwargs)
         print(f"STIX: TLP={cfg.stix_tlp}, classification={cfg.stix_classification}")
 
+    # STIX resume needs the streaming writer; the in-memory bundle has no checkpoints.
+    journal: Optional[CheckpointJournal] = None
+    if output_format != "stix" or stix_stream:
+        journal = CheckpointJournal(journal_path, append=bool(last_checkpoint), fsync_every=args.checkpoint_every)
+
+    progress = ProgressReporter(args.progress)
+
     # Stream outputs for csv/json; build bundle in memory for stix
     if output_format in ("csv", "json"):
-        with open(args.output_file, "w", newline="", encoding="utf-8") as out_fh:
-            if output_format == "csv":
-                write_results_header_csv(out_fh)
-
+        compression = output_compression(args.output_file, args.compress)
+        if compression != "none":
+            print(f"Compression: {compression}")
+        writer = ResultWriter(
+            args.output_file,
+            output_format,
+            compression=compression,
+            append=bool(last_checkpoint),
+            batch_records=args.write_batch,
+            queue_size=max(0, args.write_queue),
+            journal=journal,
+        )
+        try:
             stats = process_domains(
-                domains,
+                todo,
                 client,
                 cfg,
-                out_fh,
+                writer,
                 output_format=output_format,
                 fuzzy=args.fuzzy,
                 per_page=max(1, args.per_page),
                 max_pages=max(1, args.max_pages),
                 fallback_fuzzy=args.fallback_fuzzy,
                 stix_builder=None,
+                ordered=not args.unordered,
+                progress=progress,
             )
+        finally:
+            writer.close()
     else:
         # STIX bundle written at end
         stats = process_domains(
-            domains,
+            todo,
             client,
             cfg,
-            out_fh=None,
+            None,
             output_format="stix",
             fuzzy=args.fuzzy,
             per_page=max(1, args.per_page),
             max_pages=max(1, args.max_pages),
             fallback_fuzzy=args.fallback_fuzzy,
             stix_builder=stix_builder,
+            ordered=not args.unordered,
+            journal=journal,
+            progress=progress,
         )
-
-        bundle = stix_builder.bundle() if stix_builder else {"type": "bundle", "id": f"bundle--{uuid.uuid4()}", "objects": []}
-        with open(args.output_file, "w", encoding="utf-8") as f:
-            json.dump(bundle, f, ensure_ascii=False, indent=2)
-        stats["records_written"] = len(bundle.get("objects", []))
+        if journal:
+            journal.close()
+
+        if isinstance(stix_builder, StreamingStixBundleWriter):
+            paths = stix_builder.close()
+            stats["records_written"] = stix_builder.objects_written
+            if len(paths) > 1:
+                print(f"STIX bundles written: {len(paths)} ({paths[0]} .. {paths[-1]})")
+        else:
+            bundle = stix_builder.bundle() if stix_builder else {"type": "bundle", "id": f"bundle--{uuid.uuid4()}", "objects": []}
+            with open(args.output_file, "w", encoding="utf-8") as f:
+                json.dump(bundle, f, ensure_ascii=False, indent=2)
+            stats["records_written"] = len(bundle.get("objects", []))
 
     print("\n" + "=" * 60)
     print("PROCESSING COMPLETE")
-    print(f"Inputs:          {stats['inputs']}")
+    print(f"Inputs:          {stats['inputs']} ({domains.counters['duplicates']} duplicates skipped)")
+    if completed:
+        print(f"Resumed:         {len(completed)} inputs done in earlier runs")
     print(f"Hits:            {stats['hits']}")
     print(f"Failed inputs:   {stats['failed_inputs']}")
     print(f"Records written: {stats['records_written']}")
     print(f"Output:          {args.output_file}")
+    ls = client.limiter.stats()
+    print(f"API requests:    {ls['requests']} (throttled {ls['throttled']}, server errors {ls['server_errors']}, "
+          f"retries {ls['retries']}, paused {ls['paused_seconds']}s, final window {ls['window']})")
+    ts = client.tokens.stats()
+    print(f"Auth:            {ts['logins']} logins ({ts['proactive']} before expiry, {ts['after_401']} after 401, "
+          f"{ts['failures']} failed), {ts['login_seconds']}s logging in")
+    client.close()
+    if cache:
+        cs = cache.stats()
+        print(f"Cache:           {cs['memory_hits']} memory hits, {cs['disk_hits']} disk hits, "
+              f"{cs['misses']} misses, {cs['stores']} stored")
+        cache.close()
 
 
 if __name__ == "__main__":
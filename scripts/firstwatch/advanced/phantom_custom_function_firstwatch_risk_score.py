@@ -24,6 +24,13 @@ Outputs:
   - risk_score (int): 0-100
   - risk_level (str): LOW/MEDIUM/HIGH/CRITICAL
   - reasons (list[str]): human-readable explanation for auditability
+
+Batch use (outside SOAR, needs pandas):
+  firstwatch_risk_score_batch(df) scores a whole DataFrame with the same
+  weights and adds risk_score / risk_level columns; reasons are only built
+  for rows at or above reasons_threshold.
+    $ python phantom_custom_function_firstwatch_risk_score.py results.csv scored.csv \
+          --map confidence=payload.risk_score --min-level MEDIUM
 """
 
 def _clamp(n, low=0, high=100):
@@ -128,3 +135,169 @@ def firstwatch_risk_score(confidence=0, tlp="AMBER", classification="unknown",
         "risk_level": _risk_level(score),
         "reasons": reasons
     }
+
+
+# ---------------------------------------------------------------------------
+# Batch scoring (outside SOAR: triage whole fw.py result files)
+#
+# Same weights and thresholds as firstwatch_risk_score(), computed over whole
+# columns with NumPy/pandas. Reasons are only built for rows scoring at or
+# above reasons_threshold, by running firstwatch_risk_score() on those rows,
+# so their wording always matches the single-domain function.
+# pandas/numpy are imported here, not at the top, so the function above can
+# still be pasted into SOAR on its own.
+# ---------------------------------------------------------------------------
+
+RISK_INPUTS = ("confidence", "tlp", "classification", "domain_age_days",
+               "brand_similarity", "has_dns", "pDNS_hits", "corroborated")
+
+_TRUE = ("true", "1", "yes", "y", "t")
+_FALSE = ("false", "0", "no", "n", "f")
+
+
+def _bool_column(values, pd):
+    # True/False/None per row; CSV text like "true"/"0" counts as a bool here.
+    s = pd.Series(values, dtype="object")
+    text = s.astype(str).str.strip().str.lower()
+    return s.where(s.map(lambda v: isinstance(v, bool)),
+                   text.map(lambda t: True if t in _TRUE else (False if t in _FALSE else None)))
+
+
+def firstwatch_risk_score_batch(data, columns=None, reasons_threshold=None):
+    """
+    Score many domains at once.
+
+    data: pandas DataFrame, or a dict of equal-length columns.
+    columns: optional {input name: column name} for inputs stored under other
+             names (input names are the arguments of firstwatch_risk_score).
+             Missing inputs use the same defaults as firstwatch_risk_score.
+    reasons_threshold: add a "reasons" column for rows with risk_score >= this
+                       (None = no reasons column).
+    Returns a copy of the frame with risk_score and risk_level columns added.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(data).copy() if not isinstance(data, pd.DataFrame) else data.copy()
+    n = len(df)
+    names = dict(zip(RISK_INPUTS, RISK_INPUTS))
+    names.update(columns or {})
+
+    def col(name):
+        c = names[name]
+        return df[c] if c in df.columns else None
+
+    def numeric(name):
+        c = col(name)
+        return pd.to_numeric(c, errors="coerce").to_numpy(dtype=float) if c is not None else np.full(n, np.nan)
+
+    score = np.zeros(n)
+
+    # Confidence weighting (0-100)
+    score += 0.45 * np.nan_to_num(numeric("confidence"), nan=0.0)
+
+    # Classification bias
+    c = col("classification")
+    if c is not None:
+        cls = c.fillna("unknown").astype(str).str.lower().to_numpy()
+        score += np.select(
+            [np.isin(cls, ("malicious", "phishing", "fraud")),
+             np.isin(cls, ("anomalous", "suspicious")),
+             cls == "benign"],
+            [15, 8, -10], 0)
+
+    # Domain age: newer = riskier (early-stage); unknown ages add nothing
+    age = np.trunc(numeric("domain_age_days"))
+    with np.errstate(invalid="ignore"):
+        score += np.select([age <= 1, age <= 7, age <= 30], [15, 10, 5], 0)
+
+    # Brand similarity (0-1)
+    sim = numeric("brand_similarity")
+    with np.errstate(invalid="ignore"):
+        score += np.select([sim >= 0.92, sim >= 0.85], [18, 10], 0)
+
+    # DNS presence (resolves = more actionable)
+    c = col("has_dns")
+    if c is not None:
+        dns = _bool_column(c, pd)
+        score += np.where(dns.eq(True).to_numpy(), 6, np.where(dns.eq(False).to_numpy(), -3, 0))
+
+    # Passive DNS volume
+    hits = np.trunc(numeric("pDNS_hits"))
+    with np.errstate(invalid="ignore"):
+        score += np.select([hits >= 25, hits >= 5], [8, 4], 0)
+
+    # Corroboration (telemetry confirmation)
+    c = col("corroborated")
+    if c is not None:
+        score += np.where(_bool_column(c, pd).eq(True).to_numpy(), 25, 0)
+
+    score = np.clip(np.round(score), 0, 100).astype(int)
+    df["risk_score"] = score
+    df["risk_level"] = np.select([score >= 85, score >= 70, score >= 45],
+                                 ["CRITICAL", "HIGH", "MEDIUM"], "LOW")
+
+    if reasons_threshold is not None:
+        present = [name for name in RISK_INPUTS if names[name] in df.columns]
+        picked = df.loc[score >= reasons_threshold, [names[name] for name in present]]
+        picked.columns = present
+        for name in ("has_dns", "corroborated"):
+            if name in present:
+                picked[name] = _bool_column(picked[name], pd).to_numpy()
+        reasons = {}
+        for idx, row in zip(picked.index, picked.to_dict("records")):
+            kwargs = {k: (None if not isinstance(v, (list, dict)) and pd.isna(v) else v) for k, v in row.items()}
+            reasons[idx] = firstwatch_risk_score(**kwargs)["reasons"]
+        df["reasons"] = pd.Series(reasons, index=df.index, dtype="object")
+    return df
+
+
+def load_fw_output(path):
+    """
+    Read fw.py csv or JSONL output into a DataFrame of its successful records,
+    with the payload fields flattened into columns (nested keys joined by ".").
+    Payload fields named like the score outputs become payload.<name>.
+    """
+    import json
+    import pandas as pd
+
+    if path.endswith((".jsonl", ".jsonl.gz", ".json.gz")) or path.endswith(".json"):
+        records = pd.read_json(path, lines=True, dtype=False)
+        payloads = records["payload"]
+    else:
+        records = pd.read_csv(path, dtype=str, keep_default_na=False)
+        payloads = records["payload_json"].map(lambda s: json.loads(s) if s else None)
+
+    ok = (records["status"] == "success") & payloads.map(lambda p: isinstance(p, dict))
+    flat = pd.json_normalize(payloads[ok].tolist())
+    flat.index = records.index[ok]
+    flat = flat.rename(columns={c: f"payload.{c}" for c in ("risk_score", "risk_level", "reasons")})
+    base = records.loc[ok, ["input_query", "matched_domain", "mode"]]
+    return pd.concat([base, flat.drop(columns=[c for c in base.columns if c in flat.columns])], axis=1)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Risk-score fw.py csv/JSONL output in bulk.")
+    parser.add_argument("input_file", help="fw.py output (.csv or .jsonl)")
+    parser.add_argument("output_file", help="Scored csv")
+    parser.add_argument("--map", action="append", default=[], metavar="INPUT=COLUMN",
+                        help="Take a scoring input from another payload column, e.g. confidence=payload.risk_score")
+    parser.add_argument("--min-level", choices=["LOW", "MEDIUM", "HIGH", "CRITICAL"], default="LOW",
+                        help="Only write rows at or above this level (default: all)")
+    parser.add_argument("--reasons-threshold", type=int, default=70,
+                        help="Add reasons for rows scoring at least this (default: 70)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    frame = load_fw_output(args.input_file)
+    scored = firstwatch_risk_score_batch(
+        frame, dict(m.split("=", 1) for m in args.map), reasons_threshold=args.reasons_threshold)
+    floor = {"LOW": 0, "MEDIUM": 45, "HIGH": 70, "CRITICAL": 85}[args.min_level]
+    scored = scored[scored["risk_score"] >= floor].sort_values("risk_score", ascending=False)
+    scored.to_csv(args.output_file, index=False)
+    print(f"Scored {len(frame)} records in {time.perf_counter() - start:.2f}s; "
+          f"wrote {len(scored)} to {args.output_file}")
+    print(scored["risk_level"].value_counts().to_string())
@@ -0,0 +1,88 @@
+"""
+Tests for fw.py's lookup result cache (memory LRU over sqlite, TTLs).
+  $ python -m pytest scripts/firstwatch/advanced/test_fw_cache.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fw  # noqa: E402
+
+HIT = (200, {"domain": "evil.com", "risk": 90}, "")
+NOT_FOUND = (404, None, "not found")
+
+
+class _Clock:
+    """Stands in for time.time() so TTLs can expire without waiting."""
+
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(tmp_path, monkeypatch, **kwargs):
+    clock = _Clock()
+    monkeypatch.setattr(fw.time, "time", clock)
+    options = dict(ttls={"check": 3600.0, "fuzzy": 600.0}, negative_ttl=60.0)
+    options.update(kwargs)
+    return fw.ResultCache(str(tmp_path / "cache.db"), **options), clock
+
+
+def test_hit_is_kept_for_the_endpoint_ttl(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch)
+    cache.put("check", "Evil.com", 0, 0, HIT)
+    assert cache.get("check", "evil.com") == HIT
+    clock.now += 3599
+    assert cache.get("check", "EVIL.COM") == HIT
+    clock.now += 2
+    assert cache.get("check", "evil.com") is None
+    assert cache.stats() == {"memory_hits": 2, "disk_hits": 0, "misses": 1, "stores": 1}
+
+
+def test_not_found_uses_the_negative_ttl(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch)
+    cache.put("check", "gone.com", 0, 0, NOT_FOUND)
+    clock.now += 59
+    assert cache.get("check", "gone.com") == NOT_FOUND
+    clock.now += 2
+    assert cache.get("check", "gone.com") is None
+
+
+def test_errors_and_disabled_ttls_are_not_cached(tmp_path, monkeypatch):
+    cache, _ = _cache(tmp_path, monkeypatch, negative_ttl=0.0)
+    cache.put("check", "a.com", 0, 0, (500, None, "server error"))
+    cache.put("check", "b.com", 0, 0, (200, None, "Non-JSON response: <html>"))
+    cache.put("check", "c.com", 0, 0, NOT_FOUND)
+    cache.put("quota", "", 0, 0, (200, {"remaining": 1}, ""))
+    assert all(cache.get(*key) is None for key in (("check", "a.com"), ("check", "b.com"),
+                                                   ("check", "c.com"), ("quota", "")))
+    assert cache.stats()["stores"] == 0
+
+
+def test_pages_are_separate_entries(tmp_path, monkeypatch):
+    cache, _ = _cache(tmp_path, monkeypatch)
+    cache.put("fuzzy", "paypal", 1, 50, (200, {"page": 1}, ""))
+    cache.put("fuzzy", "paypal", 2, 50, (200, {"page": 2}, ""))
+    assert cache.get("fuzzy", "paypal", 2, 50)[1] == {"page": 2}
+    assert cache.get("fuzzy", "paypal", 1, 100) is None
+
+
+def test_entries_outlive_the_memory_lru_and_the_process(tmp_path, monkeypatch):
+    cache, clock = _cache(tmp_path, monkeypatch, memory_entries=1)
+    cache.put("check", "a.com", 0, 0, HIT)
+    cache.put("check", "b.com", 0, 0, NOT_FOUND)
+    assert cache.get("check", "a.com") == HIT  # evicted from memory, read from sqlite
+    assert cache.stats()["disk_hits"] == 1
+    cache.close()
+
+    reopened = fw.ResultCache(str(tmp_path / "cache.db"), ttls={"check": 3600.0}, negative_ttl=60.0)
+    assert reopened.get("check", "b.com") == NOT_FOUND
+    clock.now += 61
+    reopened.close()
+    # Expired rows are purged when the cache is opened
+    again = fw.ResultCache(str(tmp_path / "cache.db"), ttls={"check": 3600.0}, negative_ttl=60.0)
+    assert again.db.execute("SELECT query FROM results").fetchall() == [("a.com",)]
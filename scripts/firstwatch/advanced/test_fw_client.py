@@ -0,0 +1,180 @@
+"""
+Tests for fw.py's client plumbing: the adaptive limiter, retry backoff and
+the shared JWT.
+  $ python -m pytest scripts/firstwatch/advanced/test_fw_client.py
+"""
+
+import base64
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fw  # noqa: E402
+
+
+def _response(status, **headers):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers)
+    return resp
+
+
+def _client(monkeypatch, statuses):
+    """FirstWatchClient whose GETs answer with `statuses` in turn; returns (client, sleeps)."""
+    cfg = fw.FWConfig(username="u", password="p", max_retries=3, rate_limit=1000.0, concurrency=4)
+    client = fw.FirstWatchClient(cfg)
+    client.tokens = fw.TokenManager(lambda: "token")
+    monkeypatch.setattr(client.limiter.bucket, "acquire", lambda: None)
+    answers = iter(statuses)
+    monkeypatch.setattr(client.session, "get", lambda url, **kwargs: next(answers))
+    sleeps = []
+    monkeypatch.setattr(fw.time, "sleep", sleeps.append)
+    return client, sleeps
+
+
+def test_limiter_window_is_aimd():
+    limiter = fw.AdaptiveLimiter(1000.0, max_concurrency=8)
+    limiter.record(_response(429))
+    assert limiter.window == 4.0
+    limiter.record(_response(200))
+    assert limiter.window == 4.25
+    limiter.record(_response(500))
+    assert limiter.window == 4.25
+    assert limiter.stats()["throttled"] == 1 and limiter.stats()["server_errors"] == 1
+
+
+def test_limiter_returns_the_pause_it_applied():
+    limiter = fw.AdaptiveLimiter(1000.0)
+    assert limiter.record(_response(503, **{"Retry-After": "2"})) == 2.0
+    assert limiter.paused_until > 0
+    assert limiter.record(_response(429, **{"Retry-After": "0"})) == 0.0
+    assert limiter.record(_response(429, **{"Retry-After": "soon"})) == 0.0
+    # Retry-After is only a pause signal on 429/503
+    assert limiter.record(_response(500, **{"Retry-After": "2"})) == 0.0
+    assert limiter.record(_response(200, **{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "3"})) == 3.0
+
+
+def test_retry_after_pause_replaces_backoff(monkeypatch):
+    client, sleeps = _client(monkeypatch, [_response(503, **{"Retry-After": "2"}), _response(200)])
+    assert client._request("http://fw.test/x").status_code == 200
+    # Only the limiter's pause before the retry, no jittered backoff on top
+    assert len(sleeps) == 1 and 1.5 < sleeps[0] <= 2.0
+
+
+def test_5xx_with_retry_after_still_backs_off(monkeypatch):
+    client, sleeps = _client(monkeypatch, [_response(500, **{"Retry-After": "2"}), _response(200)])
+    assert client._request("http://fw.test/x").status_code == 200
+    assert len(sleeps) == 1 and 0.375 <= sleeps[0] <= 0.75
+    assert client.limiter.paused_until == 0.0
+
+
+def test_unusable_retry_after_still_backs_off(monkeypatch):
+    client, sleeps = _client(monkeypatch, [
+        _response(429, **{"Retry-After": "0"}),
+        _response(429, **{"Retry-After": "not a date"}),
+        _response(200),
+    ])
+    assert client._request("http://fw.test/x").status_code == 200
+    assert len(sleeps) == 2
+    assert 0.375 <= sleeps[0] <= 0.75 and 0.75 <= sleeps[1] <= 1.5
+
+
+def test_parse_retry_after():
+    # Same cases as kyc.py's copy of the helper
+    assert fw._parse_retry_after(None) is None
+    assert fw._parse_retry_after(" 7 ") == 7.0
+    assert fw._parse_retry_after("-3") == 0.0
+    assert fw._parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert fw._parse_retry_after("soon") is None
+
+
+def test_delay_only_paces_a_single_worker():
+    assert fw.FWConfig(username="u", password="p", delay=0.5).requests_per_second == 2.0
+    assert fw.FWConfig(username="u", password="p", delay=0.5, concurrency=8).requests_per_second == 0.0
+    assert fw.FWConfig(username="u", password="p", delay=0.5, concurrency=8, rate_limit=20).requests_per_second == 20.0
+
+
+def _jwt(exp):
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{claims}.signature"
+
+
+class _SlowLogin:
+    """Login callable that takes a while and counts its calls."""
+
+    def __init__(self, lifetime=3600.0, seconds=0.05):
+        self.lifetime = lifetime
+        self.seconds = seconds
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            n = self.calls
+        time.sleep(self.seconds)
+        return _jwt(time.time() + self.lifetime) + str(n)
+
+
+def _token_from_threads(tokens, n, before=None):
+    start = threading.Barrier(n)
+
+    def call(_):
+        start.wait()
+        if before:
+            before()
+        return tokens.token()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(call, range(n)))
+
+
+def test_token_logs_in_once_under_many_threads():
+    login = _SlowLogin()
+    tokens = fw.TokenManager(login)
+    got = _token_from_threads(tokens, 16)
+    assert login.calls == 1
+    assert len(set(got)) == 1
+    stats = tokens.stats()
+    assert stats["logins"] == 1 and 3590 <= stats["expires_in"] <= 3600
+
+
+def test_burst_of_401s_logs_in_once():
+    login = _SlowLogin()
+    tokens = fw.TokenManager(login)
+    old = tokens.token()
+    got = _token_from_threads(tokens, 16, before=lambda: tokens.invalidate(old))
+    assert login.calls == 2
+    assert set(got) == {tokens.token()} and old not in got
+    assert tokens.stats()["after_401"] == 1
+
+
+def test_proactive_refresh_keeps_serving_the_old_token():
+    login = _SlowLogin(lifetime=30.0, seconds=0.2)
+    tokens = fw.TokenManager(login, refresh_margin=60.0)
+    old = tokens.token()
+    got = _token_from_threads(tokens, 8)
+    # One caller refreshes; the others use the still-valid token meanwhile
+    assert login.calls == 2
+    assert old in got and len(set(got)) == 2
+    assert tokens.stats()["proactive"] == 1
+
+
+def test_failed_login_is_raised_to_waiters():
+    def login():
+        time.sleep(0.05)
+        raise RuntimeError("bad password")
+
+    tokens = fw.TokenManager(login)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(tokens.token) for _ in range(4)]
+    errors = [f.exception() for f in futures]
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert tokens.stats()["failures"] >= 1
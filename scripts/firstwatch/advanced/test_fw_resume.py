@@ -0,0 +1,88 @@
+"""
+Resume tests for fw.py's streaming STIX writer.
+  $ python -m pytest scripts/firstwatch/advanced/test_fw_resume.py
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fw  # noqa: E402
+
+STIX_KWARGS = dict(identity_name="test", tlp="amber", classification="malicious")
+
+
+def _write_interrupted(path, bundle_size, done, lost):
+    """Write `done` hits, checkpoint, write `lost` hits, then stop without closing (a crash)."""
+    writer = fw.StreamingStixBundleWriter(path, bundle_size=bundle_size, **STIX_KWARGS)
+    for domain in done:
+        writer.add_hit(domain=domain, source_payload={}, mode="exact")
+    last_file, offset, _ = writer.position()
+    for domain in lost:
+        writer.add_hit(domain=domain, source_payload={}, mode="exact")
+    writer._fh.flush()
+    writer._fh.close()
+    return {"f": last_file, "o": offset}
+
+
+def _domains(paths):
+    found = []
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            bundle = json.load(f)
+        found += [o["value"] for o in bundle["objects"] if o["type"] == "domain-name"]
+    return found
+
+
+def test_resume_single_bundle(tmp_path):
+    path = str(tmp_path / "out.json")
+    last = _write_interrupted(path, 0, ["a.com", "b.com"], ["c.com"])
+
+    fw.rewind_output(last)
+    writer = fw.StreamingStixBundleWriter.resume(path, last["f"], bundle_size=0, **STIX_KWARGS)
+    writer.add_hit(domain="c.com", source_payload={}, mode="exact")
+    paths = writer.close()
+
+    assert paths == [path]
+    assert _domains(paths) == ["a.com", "b.com", "c.com"]
+
+
+def test_resume_split_bundles_drops_later_files(tmp_path):
+    path = str(tmp_path / "out.json")
+    # bundle_size 5: identity + marking + 3 objects per hit -> one hit per file
+    last = _write_interrupted(path, 5, ["a.com", "b.com"], ["c.com", "d.com"])
+
+    fw.rewind_output(last)
+    writer = fw.StreamingStixBundleWriter.resume(path, last["f"], bundle_size=5, **STIX_KWARGS)
+    for domain in ("c.com", "d.com"):
+        writer.add_hit(domain=domain, source_payload={}, mode="exact")
+    paths = writer.close()
+
+    assert sorted(_domains(paths)) == ["a.com", "b.com", "c.com", "d.com"]
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths)
+
+
+def test_journal_records_each_batch_atomically(tmp_path):
+    out = str(tmp_path / "out.jsonl")
+    journal_path = out + ".journal"
+    journal = fw.CheckpointJournal(journal_path, append=False, fsync_every=1)
+    writer = fw.ResultWriter(out, "json", batch_records=3, flush_seconds=3600, queue_size=0, journal=journal)
+    domains = [f"d{i}.com" for i in range(5)]
+    for domain in domains:
+        writer.add(domain, [{"domain": domain}])
+    writer.close()
+
+    with open(journal_path, "r", encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["d"] for e in entries] == [domains[:3], domains[3:]]
+
+    # A crash mid-line leaves the previous batch as the checkpoint
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"d": ["d5.com", "d6')
+    completed, last = fw.CheckpointJournal.load(journal_path)
+    assert completed == set(domains)
+    assert last == entries[-1]
+    with open(out, "rb") as f:
+        assert len(f.read()) == last["o"]
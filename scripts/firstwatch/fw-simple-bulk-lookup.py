@@ -10,6 +10,8 @@
 #   python script.py domains.csv results.csv
 # Run with custom config file  
 #   python script.py -c myconfig.conf domains.csv results.csv
+# Continue an interrupted run (uses results.csv.journal)
+#   python script.py --resume domains.csv results.csv
 
 import requests
 import json
@@ -18,7 +20,7 @@ import csv
 import argparse
 import configparser
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set, Tuple
 from datetime import datetime
 import time
 
@@ -251,7 +253,50 @@ def write_result_to_file(output_file, domain: str, result: Optional[Dict[Any, An
     output_file.write(f'"{timestamp}","{domain}","{status}","{response_json}"\n')
     output_file.flush()  # Ensure data is written immediately
 
-def process_domains(domains: List[str], jwt_token: str, config: Dict[str, str], output_file) -> Dict[str, int]:
+def load_journal(journal_file: str) -> Tuple[Set[str], Optional[int]]:
+    """
+    Load the checkpoint journal of an earlier run
+    
+    Each journal line is "<output size>\t<domain>", written after the domain's
+    result row is in the output file.
+    
+    Args:
+        journal_file: Path to the journal file
+        
+    Returns:
+        Set of completed domains and the output size after the last of them
+        (None if there is no journal)
+    """
+    done = set()
+    offset = None
+    if not os.path.exists(journal_file):
+        return done, offset
+    
+    with open(journal_file, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.endswith('\n'):
+                break  # torn last line from a crash
+            size, _, domain = line.rstrip('\n').partition('\t')
+            done.add(domain)
+            offset = int(size)
+    
+    return done, offset
+
+def record_checkpoint(journal, output_file, domain: str, count: int, sync_every: int):
+    """
+    Append a completed domain to the journal
+    
+    Every sync_every domains the output file and then the journal are
+    fsync'ed, so the journal never gets ahead of the results on disk.
+    """
+    journal.write(f"{output_file.tell()}\t{domain}\n")
+    if count % sync_every == 0:
+        os.fsync(output_file.fileno())
+        journal.flush()
+        os.fsync(journal.fileno())
+
+def process_domains(domains: List[str], jwt_token: str, config: Dict[str, str], output_file,
+                    journal=None, sync_every: int = 100) -> Dict[str, int]:
     """
     Process all domains and write results to file
     
@@ -260,6 +305,8 @@ def process_domains(domains: List[str], jwt_token: str, config: Dict[str, str],
         jwt_token: JWT authentication token
         config: Configuration dictionary
         output_file: Open file handle for output
+        journal: Open checkpoint journal, or None
+        sync_every: fsync output and journal every N domains
         
     Returns:
         Dictionary with processing statistics
@@ -289,6 +336,8 @@ def process_domains(domains: List[str], jwt_token: str, config: Dict[str, str],
         
         # Write result to file
         write_result_to_file(output_file, domain, result, status)
+        if journal:
+            record_checkpoint(journal, output_file, domain, i, sync_every)
         
         # Add delay between requests (except for the last one)
         if i < stats['total'] and delay > 0:
@@ -329,6 +378,7 @@ def main():
 Examples:
   %(prog)s domains.csv results.csv
   %(prog)s -c myconfig.conf domains.csv results.csv
+  %(prog)s --resume domains.csv results.csv
   %(prog)s --create-config
         """
     )
@@ -357,6 +407,19 @@ Examples:
         help='Create a sample configuration file'
     )
     
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip domains listed in <output_file>.journal and append to the existing output'
+    )
+    
+    parser.add_argument(
+        '--checkpoint-every',
+        type=int,
+        default=100,
+        help='fsync output and journal every N domains (default: 100)'
+    )
+    
     args = parser.parse_args()
     
     # Handle create-config option
@@ -383,6 +446,22 @@ Examples:
             print("ERROR: No domains found in CSV file")
             sys.exit(1)
         
+        # Skip domains finished by an earlier run
+        journal_file = args.output_file + '.journal'
+        offset = None
+        if args.resume:
+            done, offset = load_journal(journal_file)
+            if offset is not None:
+                # Drop anything written after the last checkpoint, it is redone
+                with open(args.output_file, 'r+b') as output_file:
+                    output_file.truncate(offset)
+                domains = [domain for domain in domains if domain not in done]
+                print(f"Resuming: {len(done)} domains already done, {len(domains)} left")
+            
+            if not domains:
+                print("Nothing left to do")
+                return
+        
         # Get JWT token
         jwt_token = get_jwt_token(
             config['username'], 
@@ -395,12 +474,16 @@ Examples:
             sys.exit(1)
         
         # Open output file and process domains
-        with open(args.output_file, 'w', newline='', encoding='utf-8') as output_file:
+        resuming = offset is not None
+        with open(args.output_file, 'a' if resuming else 'w', newline='', encoding='utf-8') as output_file, \
+             open(journal_file, 'a' if resuming else 'w', encoding='utf-8') as journal:
             # Write header
-            write_results_header(output_file)
+            if not resuming:
+                write_results_header(output_file)
             
             # Process all domains
-            stats = process_domains(domains, jwt_token, config, output_file)
+            stats = process_domains(domains, jwt_token, config, output_file,
+                                    journal, max(1, args.checkpoint_every))
             
             # Print final statistics
             print("\n" + "=" * 50)
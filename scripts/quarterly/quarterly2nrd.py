@@ -2,6 +2,10 @@
 
 import sys
 import os
+import io
+import importlib.util
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from argparse import ArgumentParser
 from tqdm import tqdm
@@ -31,15 +35,39 @@ parser.add_argument('--chunksize',
                     default=10000,
                     required=False)
 
-parser.add_argument('--progress',
-                    help="Display progress bar. For experiment only as the bar is on stdout.",
+parser.add_argument('--workers',
+                    type=int,
+                    help='Number of processes converting chunks in parallel, 0 means one per CPU core. Defaults to 1 (no parallelism).',
+                    default=1,
+                    required=False)
+
+parser.add_argument('--drop-raw-text',
+                    help="Do not read the raw text columns (registry and WHOIS record raw texts, contact raw texts) and leave them out of the output.",
                     action="store_true")
 
-ARGS = parser.parse_args()
+parser.add_argument('--engine',
+                    choices=['auto', 'c', 'pyarrow'],
+                    help="CSV parser to use. 'auto' (default) uses pyarrow when it is installed and the C parser otherwise.",
+                    default='auto',
+                    required=False)
+
+parser.add_argument('--output-format',
+                    choices=['csv', 'parquet'],
+                    help="Output file format, defaults to csv. parquet needs pyarrow.",
+                    default='csv',
+                    required=False)
+
+parser.add_argument('--partition-by-tld',
+                    help="With parquet output, write a directory partitioned by TLD (outfile/tld=com/...) instead of a single file.",
+                    action="store_true")
 
+parser.add_argument('--keep-reason',
+                    help="Keep the reason column of the input where it has one, e.g. when converting an NRD feed file to parquet.",
+                    action="store_true")
 
-if os.path.exists(ARGS.outfile):
-    raise ValueError('%s already exists, not overwriting.'%(ARGS.outfile))
+parser.add_argument('--progress',
+                    help="Display progress bar. For experiment only as the bar is on stdout.",
+                    action="store_true")
 
 NRD_FIELDS = ["reason","domainName","registrarName","registrarIANAID","whoisServer","nameServers","createdDateRaw","updatedDateRaw","expiresDateRaw","createdDateParsed","updatedDateParsed","expiresDateParsed","status","registryDataRawText","whoisRecordRawText","auditUpdatedDate","contactEmail","registrant_rawText","registrant_email","registrant_name","registrant_organization","registrant_street1","registrant_street2","registrant_street3","registrant_street4","registrant_city","registrant_state","registrant_postalCode","registrant_country","registrant_fax","registrant_faxExt","registrant_telephone","registrant_telephoneExt","administrativeContact_rawText","administrativeContact_email","administrativeContact_name","administrativeContact_organization","administrativeContact_street1","administrativeContact_street2","administrativeContact_street3","administrativeContact_street4","administrativeContact_city","administrativeContact_state","administrativeContact_postalCode","administrativeContact_country","administrativeContact_fax","administrativeContact_faxExt","administrativeContact_telephone","administrativeContact_telephoneExt","billingContact_rawText","billingContact_email","billingContact_name","billingContact_organization","billingContact_street1","billingContact_street2","billingContact_street3","billingContact_street4","billingContact_city","billingContact_state","billingContact_postalCode","billingContact_country","billingContact_fax","billingContact_faxExt","billingContact_telephone","billingContact_telephoneExt","technicalContact_rawText","technicalContact_email","technicalContact_name","technicalContact_organization","technicalContact_street1","technicalContact_street2","technicalContact_street3","technicalContact_street4","technicalContact_city","technicalContact_state","technicalContact_postalCode","technicalContact_country","technicalContact_fax","technicalContact_faxExt","technicalContact_telephone","technicalContact_telephoneExt","zoneContact_rawText","zoneContact_email","zoneContact_name","zoneContact_organization","zoneContact_street1","zoneContact_street2","zoneContact_street3","zoneContact_street4","zoneContact_city","zoneContact_state","zoneContact_postalCode","zoneContact_country","zoneContact_fax","zoneContact_faxExt","zoneContact_telephone","zoneContact_telephoneExt"]
 
@@ -53,21 +81,230 @@ RENAME_FIELDS = {'createdDate':'createdDateRaw',
                  'RegistryData_rawText':'registryDataRawText',
                  'WhoisRecord_rawText':'whoisRecordRawText'}
 
-if ARGS.progress:
-    iterator = tqdm(pd.read_csv(ARGS.infile,
-                                chunksize=ARGS.chunksize,
-                                keep_default_na=False),
-                    desc='Converting') 
-else:
-    iterator = pd.read_csv(ARGS.infile,
-                           chunksize=ARGS.chunksize,
-                           keep_default_na=False)
-for chunk in iterator:
-        chunk.rename(columns=RENAME_FIELDS, inplace=True)
-        chunk['reason'] = ARGS.reasonfield
-        newfields = [field for field in NRD_FIELDS if field in set(chunk.keys())]
-        chunk = chunk[newfields]
-        chunk.to_csv(ARGS.outfile,
-                     index=False,
-                     mode='a',
-                     header=not os.path.exists(ARGS.outfile))
+RAW_TEXT_FIELDS = set(field for field in NRD_FIELDS if field.lower().endswith('rawtext'))
+
+NRD_FIELD_SET = set(NRD_FIELDS)
+
+# Low-cardinality fields that are dictionary encoded in parquet output.
+DICTIONARY_FIELDS = set(['reason', 'registrarName', 'registrarIANAID', 'whoisServer', 'status'] +
+                        [field for field in NRD_FIELDS if field.endswith(('_country', '_state'))])
+
+Conversion = namedtuple('Conversion', ['header', 'usecols', 'outfields', 'reason', 'keep_reason',
+                                       'engine', 'output_format', 'partition_by_tld'])
+
+
+def resolve_engine(engine):
+    if engine != 'auto':
+        return engine
+    return 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+
+
+def read_header(infile):
+    """Return the raw header line of the input file and its parsed column names."""
+    with open(infile, 'rb') as fh:
+        header = fh.readline()
+    return header, list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+
+
+def projection(columns, drop_raw_text=False):
+    """Work out once which input columns are needed and the order of the output fields."""
+    wanted = NRD_FIELD_SET - RAW_TEXT_FIELDS if drop_raw_text else NRD_FIELD_SET
+    usecols = [c for c in columns if RENAME_FIELDS.get(c, c) in wanted]
+    present = set(RENAME_FIELDS.get(c, c) for c in usecols)
+    present.add('reason')
+    outfields = [field for field in NRD_FIELDS if field in present]
+    return usecols, outfields
+
+
+def convert_chunk(chunk, conv):
+    chunk = chunk.rename(columns=RENAME_FIELDS)
+    if not (conv.keep_reason and 'reason' in chunk):
+        chunk['reason'] = conv.reason
+    return chunk[conv.outfields]
+
+
+def tld_of(domain):
+    return domain.rsplit('.', 1)[-1].lower()
+
+
+def serialize(chunk, conv):
+    """Turn a converted chunk into what the writer consumes: csv text, or a list of (tld, arrow table) pairs for parquet."""
+    if conv.output_format == 'csv':
+        return chunk.to_csv(index=False, header=False)
+    import pyarrow as pa
+    schema = pa.schema([(field, pa.string()) for field in conv.outfields])
+    if not conv.partition_by_tld:
+        return [(None, pa.Table.from_pandas(chunk, preserve_index=False).cast(schema))]
+    return [(tld, pa.Table.from_pandas(part, preserve_index=False).cast(schema))
+            for tld, part in chunk.groupby(chunk['domainName'].map(tld_of), sort=False)]
+
+
+def read_blocks(infile, chunksize):
+    """Yield raw blocks of chunksize records each, without the header line.
+
+    Records may span several lines because of quoted raw text fields, so a
+    block only ends on a line where the quotes seen so far are balanced.
+    """
+    with open(infile, 'rb') as fh:
+        fh.readline()
+        block, records, inquote = [], 0, False
+        for line in fh:
+            block.append(line)
+            if line.count(b'"') % 2:
+                inquote = not inquote
+            if not inquote:
+                records += 1
+                if records >= chunksize:
+                    yield b''.join(block)
+                    block, records = [], 0
+        if block:
+            yield b''.join(block)
+
+
+def convert_block(block, conv):
+    # Every column is read as text: nothing is lost to type inference and the
+    # parser does not have to guess.
+    chunk = pd.read_csv(io.BytesIO(conv.header + block),
+                        usecols=conv.usecols,
+                        dtype=str,
+                        keep_default_na=False,
+                        engine=conv.engine)
+    return serialize(convert_chunk(chunk, conv), conv)
+
+
+_WORKER_CONVERSION = None
+
+
+def _init_worker(conv):
+    global _WORKER_CONVERSION
+    _WORKER_CONVERSION = conv
+
+
+def _convert_block(block):
+    return convert_block(block, _WORKER_CONVERSION)
+
+
+def parallel_convert(infile, conv, chunksize, workers):
+    """Convert blocks in a process pool, yielding the results in input order."""
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(conv,)) as pool:
+        pending = deque()
+        for block in read_blocks(infile, chunksize):
+            pending.append(pool.submit(_convert_block, block))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def serial_convert(infile, conv, chunksize):
+    if conv.engine == 'pyarrow':
+        # The pyarrow parser cannot read in chunks, so feed it the same blocks
+        # the workers get.
+        for block in read_blocks(infile, chunksize):
+            yield convert_block(block, conv)
+        return
+    for chunk in pd.read_csv(infile,
+                             chunksize=chunksize,
+                             usecols=conv.usecols,
+                             dtype=str,
+                             keep_default_na=False,
+                             engine=conv.engine):
+        yield serialize(convert_chunk(chunk, conv), conv)
+
+
+class CsvOutput:
+
+    def __init__(self, outfile, outfields):
+        self.fh = open(outfile, 'x', newline='')
+        pd.DataFrame(columns=outfields).to_csv(self.fh, index=False)
+
+    def write(self, text):
+        self.fh.write(text)
+
+    def close(self):
+        self.fh.close()
+
+
+class ParquetOutput:
+    """Writes one row group per converted chunk.
+
+    Without partitioning the output is a single parquet file. With it, the
+    output is a directory laid out as outfile/tld=<tld>/part-0.parquet, which
+    pyarrow.dataset and most query engines read as a dataset partitioned by tld.
+    The date columns are ISO formatted strings, so the row group statistics
+    can be used to skip row groups by date range.
+    """
+
+    def __init__(self, outfile, outfields, partition_by_tld):
+        import pyarrow as pa
+        self.outfile = outfile
+        self.partition_by_tld = partition_by_tld
+        self.schema = pa.schema([(field, pa.string()) for field in outfields])
+        self.dictionary_fields = [field for field in outfields if field in DICTIONARY_FIELDS]
+        self.writers = {}
+        if partition_by_tld:
+            os.makedirs(outfile)
+
+    def _writer(self, tld):
+        import pyarrow.parquet as pq
+        writer = self.writers.get(tld)
+        if writer is None:
+            if tld is None:
+                path = self.outfile
+            else:
+                path = os.path.join(self.outfile, 'tld=%s'%(tld), 'part-0.parquet')
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = pq.ParquetWriter(path,
+                                      self.schema,
+                                      compression='zstd',
+                                      use_dictionary=self.dictionary_fields)
+            self.writers[tld] = writer
+        return writer
+
+    def write(self, tables):
+        for tld, table in tables:
+            self._writer(tld).write_table(table)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+if __name__ == '__main__':
+    ARGS = parser.parse_args()
+
+    if os.path.exists(ARGS.outfile):
+        raise ValueError('%s already exists, not overwriting.'%(ARGS.outfile))
+    if ARGS.partition_by_tld and ARGS.output_format != 'parquet':
+        raise ValueError('--partition-by-tld needs --output-format parquet.')
+
+    workers = ARGS.workers if ARGS.workers > 0 else os.cpu_count()
+    header, columns = read_header(ARGS.infile)
+    usecols, outfields = projection(columns, ARGS.drop_raw_text)
+    conv = Conversion(header=header,
+                      usecols=usecols,
+                      outfields=outfields,
+                      reason=ARGS.reasonfield,
+                      keep_reason=ARGS.keep_reason,
+                      engine=resolve_engine(ARGS.engine),
+                      output_format=ARGS.output_format,
+                      partition_by_tld=ARGS.partition_by_tld)
+
+    if workers > 1:
+        iterator = parallel_convert(ARGS.infile, conv, ARGS.chunksize, workers)
+    else:
+        iterator = serial_convert(ARGS.infile, conv, ARGS.chunksize)
+    if ARGS.progress:
+        iterator = tqdm(iterator, desc='Converting')
+
+    if ARGS.output_format == 'parquet':
+        output = ParquetOutput(ARGS.outfile, outfields, ARGS.partition_by_tld)
+    else:
+        output = CsvOutput(ARGS.outfile, outfields)
+    try:
+        for result in iterator:
+            output.write(result)
+    finally:
+        output.close()